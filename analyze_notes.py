@@ -0,0 +1,165 @@
+# analyze-notes: stream NDJSON/CSV note exports through the text analyzer, NDJSON out
+import argparse
+import contextlib
+import csv
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from models.text_analyzer import TextAnalyzer
+from utils.install import NLTKLoader
+from utils.logging_config import configure_logging
+from utils.model_bundle import ModelBundle
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, 'dataset')
+
+# Loaded once in the parent; forked workers inherit it copy-on-write
+_pipeline = None
+
+
+def load_pipeline(batch_size):
+    """Build the same models app.py serves (snapshot, neighbour table and shared embedding store)."""
+    NLTKLoader.setup_nltk_once()
+    bundle = ModelBundle.load(DEFAULT_DATA_DIR).with_nlp_models(batch_size)
+    return bundle.analysis_pipeline
+
+
+def read_records(stream, input_format, text_field, id_field=None):
+    """
+    Lazily yield (record id, text) from an NDJSON or CSV stream.
+
+    The id is the id_field value when given and present, otherwise the 1-based record number.
+    Blank NDJSON lines are skipped; unparsable ones yield a None text so they are reported.
+    """
+    if input_format == 'csv':
+        records = csv.DictReader(stream)
+    else:
+        records = (_parse_json_line(line) for line in stream if line.strip())
+
+    for number, record in enumerate(records, start=1):
+        if record is None:
+            yield number, None
+            continue
+        record_id = record.get(id_field, number) if id_field else number
+        yield record_id, record.get(text_field)
+
+
+def _parse_json_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items without materializing the iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_chunk(chunk, mode=None):
+    """
+    Analyze one micro-batch of (id, text) records.
+
+    Returns:
+        The NDJSON output lines of the chunk, in input order (serialized here so workers share that cost)
+    """
+    valid = [i for i, (_, text) in enumerate(chunk) if isinstance(text, str) and text]
+    results = dict(zip(valid, _pipeline.analyze_batch([chunk[i][1] for i in valid], mode=mode)))
+
+    lines = []
+    for i, (record_id, _) in enumerate(chunk):
+        result = results.get(i, {'error': 'No TEXT provided'})
+        lines.append(json.dumps({'id': record_id, **result}) + '\n')
+    return lines
+
+
+def stream_results(chunks, workers, max_in_flight, mode=None):
+    """
+    Yield the output lines of every chunk, in input order.
+
+    At most max_in_flight chunks are queued or being analyzed at once, so reading the input
+    never runs ahead of a slow consumer or slow workers and memory stays bounded.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield analyze_chunk(chunk, mode)
+        return
+
+    # Freeze the loaded models out of the collector so workers don't touch (and copy) their pages
+    gc.freeze()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(analyze_chunk, (chunk, mode)))
+        while pending:
+            yield pending.popleft().get()
+
+
+def main(argv=None):
+    global _pipeline
+
+    parser = argparse.ArgumentParser(
+        prog='analyze-notes',
+        description='Analyze NDJSON or CSV notes in micro-batches and stream the results as NDJSON.',
+    )
+    parser.add_argument('input', help="NDJSON or CSV file, or '-' for stdin")
+    parser.add_argument('--format', choices=['ndjson', 'csv'],
+                        help='input format (default: from the file extension, ndjson for stdin)')
+    parser.add_argument('--text-field', default='text', help='field/column holding the note text')
+    parser.add_argument('--id-field', help='field/column copied to the output id (default: record number)')
+    parser.add_argument('--output', default='-', help="output NDJSON file, or '-' for stdout")
+    parser.add_argument('--batch-size', type=int, default=64, help='records per micro-batch')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (forked, sharing the models)')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='micro-batches queued at once (default: 2 per worker)')
+    parser.add_argument('--mode', choices=TextAnalyzer.EXTRACTION_MODES, help='candidate extractor')
+    args = parser.parse_args(argv)
+
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error('--batch-size and --workers must be positive')
+    if args.workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        parser.error('--workers needs the fork start method, which this platform does not support')
+    input_format = args.format or ('csv' if args.input.lower().endswith('.csv') else 'ndjson')
+    max_in_flight = max(1, args.max_in_flight or 2 * args.workers)
+
+    configure_logging()
+    # NLTK downloads report progress on stdout; keep stdout clean for the NDJSON output
+    with contextlib.redirect_stdout(sys.stderr):
+        _pipeline = load_pipeline(args.batch_size)
+
+    with contextlib.ExitStack() as stack:
+        source = (sys.stdin if args.input == '-'
+                  else stack.enter_context(open(args.input, newline='', encoding='utf-8')))
+        sink = (sys.stdout if args.output == '-'
+                else stack.enter_context(open(args.output, 'w', encoding='utf-8')))
+
+        start = time.perf_counter()
+        count = 0
+        records = read_records(source, input_format, args.text_field, args.id_field)
+        for lines in stream_results(chunked(records, args.batch_size), args.workers, max_in_flight, args.mode):
+            sink.writelines(lines)
+            count += len(lines)
+        sink.flush()
+        elapsed = time.perf_counter() - start
+
+    print(f"Analyzed {count} records in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} records/s)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
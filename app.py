@@ -1,30 +1,190 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory
+import functools
+import hmac
+import logging
 import os
+import time
 from flask_cors import CORS
 
-# Import modules
-from utils.data_processing import DataProcessor
-from utils.disease_processor import DiseaseProcessor
-from models.symptom_similarity import SymptomSimilarity
-from models.text_analyzer import TextAnalyzer
+# Import modules (the NLP models, and with them sklearn and NLTK, are imported by ModelBundle.with_nlp_models)
 from utils.install import NLTKLoader
+from utils.model_bundle import ModelBundle, ModelReloader
+from utils.result_cache import ResultCache
+from utils.logging_config import configure_logging
+from utils.timing import PhaseTimer, NULL_TIMER
+from utils.memory import memory_usage
+from utils.metrics import MetricsRegistry
+from utils.profiler import SamplingProfiler
+from utils.warmup import BackgroundLoader
+
+# Logging goes through a background queue listener, level from REM_LOG_LEVEL (see utils/logging_config.py)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Per-request stage timings (logged and sent as a Server-Timing header) when REM_REQUEST_TIMING is set
+request_timing = os.environ.get('REM_REQUEST_TIMING', '').lower() in ('1', 'true', 'yes')
+# Request/stage histograms for /metrics, on unless REM_METRICS=0
+metrics_enabled = os.environ.get('REM_METRICS', '1').lower() not in ('0', 'false', 'no')
+# Directory for sampling profiles of requests sent with an X-Profile header; profiling is off when unset
+profile_dir = os.environ.get('REM_PROFILE_DIR')
+# 'background' builds the NLP models on a thread while the catalogue routes already serve;
+# analysis routes wait up to REM_WARMUP_WAIT seconds for them, then answer 503
+warmup_mode = os.environ.get('REM_WARMUP', 'eager').lower()
+warmup_wait = float(os.environ.get('REM_WARMUP_WAIT', 10))
+
+startup_timer = PhaseTimer('startup')
 
 app = Flask(__name__)
 CORS(app)
 
-# Install NLTK requirements once and only ONCE!
-NLTKLoader.setup_nltk_once()
+# Install NLTK requirements once and only ONCE! (only verified on disk when REM_NLTK_DATA names a vendored copy)
+with startup_timer.phase('nltk'):
+    NLTKLoader.setup_nltk_once()
+
+# Load the compiled knowledge base; it is rebuilt only when the CSVs change (see build_index.py)
+# REM_DATA_DIR points the app at another copy of the dataset directory (e.g. the scaled benchmark datasets)
+data_dir = os.environ.get('REM_DATA_DIR', os.path.join(os.path.dirname(__file__), 'dataset'))
+
+# REM_SNAPSHOT_PATH keeps the compiled snapshot elsewhere, e.g. when the dataset directory is read-only
+snapshot_path = os.environ.get('REM_SNAPSHOT_PATH')
+
+# Largest number of texts /api/analyze_batch accepts in one request
+max_batch_size = int(os.environ.get('REM_MAX_BATCH_SIZE', 64))
+
+# Every request serves from models.current, taken once per request (see utils/model_bundle.py).
+# The catalogue side is built here; the NLP models are added by load_nlp_models
+initial_bundle = ModelBundle.load(data_dir, timer=startup_timer, snapshot_path=snapshot_path)
+
+def build_bundle(previous, timer):
+    """A complete new bundle from the files on disk, reusing what did not change (reloads)"""
+    nlp_models.wait()
+    bundle = ModelBundle.load(data_dir, previous=previous, timer=timer, snapshot_path=snapshot_path)
+    return bundle.with_nlp_models(max_batch_size, previous=previous, warm_up=True, timer=timer)
+
+# Results of repeated analyze_text/related_symptoms inputs; keys include the model version,
+# so a reloaded or rebuilt model never serves stale results. REM_CACHE_URL=redis://... shares it between workers
+result_cache = ResultCache.from_url(os.environ.get('REM_CACHE_URL'), initial_bundle.version,
+                                    maxsize=int(os.environ.get('REM_CACHE_SIZE', 4096)),
+                                    ttl=float(os.environ.get('REM_CACHE_TTL', 300)))
 
-# Initialize data processor
-data_path = os.path.join(os.path.dirname(__file__), 'dataset', 'dataset.csv')
-data_processor = DataProcessor(data_path)
+models = ModelReloader(initial_bundle, build_bundle, on_swap=lambda bundle: result_cache.set_version(bundle.version))
 
-data_path_diseases = os.path.join(os.path.dirname(__file__), 'dataset', 'diseases.csv')
-disease_processor = DiseaseProcessor(data_path=data_path_diseases)
+def load_nlp_models():
+    # Nothing waits on the background thread, so it also loads the POS tagger and WordNet;
+    # in eager mode they load on the first request that needs them
+    models.swap(models.current.with_nlp_models(max_batch_size, warm_up=warmup_mode == 'background',
+                                               timer=startup_timer))
 
-# Init NLP Models
-symptom_similarity_model = SymptomSimilarity(data_processor.get_all_symptoms())
-text_analyzer = TextAnalyzer(data_processor.get_all_symptoms())
+nlp_models = BackgroundLoader('nlp_models', load_nlp_models)
+if warmup_mode == 'background':
+    nlp_models.start()
+else:
+    nlp_models.run()
+
+def requires_nlp_models(view):
+    """Answer 503 instead of running the view while the NLP models are still loading (or failed to)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not nlp_models.wait(warmup_wait):
+            response = jsonify({'error': 'Models are still loading, retry later'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        # The NLP bundle may have been swapped in after this request took models.current
+        if g.bundle.text_analyzer is None:
+            g.bundle = models.current
+        return view(*args, **kwargs)
+    return wrapper
+
+# Hot reload: POST /api/admin/reload (with REM_ADMIN_TOKEN), or polling the source files every REM_RELOAD_WATCH seconds
+admin_token = os.environ.get('REM_ADMIN_TOKEN')
+reload_watch_interval = float(os.environ.get('REM_RELOAD_WATCH', 0))
+if reload_watch_interval > 0:
+    models.watch(reload_watch_interval)
+
+logger.info(startup_timer.summary())
+
+# Metrics exposed on /metrics
+metrics = MetricsRegistry()
+request_latency = metrics.histogram('request_duration_seconds', 'Request latency by endpoint', ['endpoint'])
+requests_total = metrics.counter('requests_total', 'Requests by endpoint and status', ['endpoint', 'status'])
+stage_latency = metrics.histogram('stage_duration_seconds', 'Latency of request stages', ['endpoint', 'stage'])
+request_items = metrics.histogram('request_items', 'Items per request, e.g. candidate phrases and matched symptoms',
+                                  ['endpoint', 'item'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+startup_seconds = metrics.gauge('startup_phase_seconds', 'Duration of startup phases', ['component', 'phase'])
+# A callback, so phases that finish on the background warm-up thread show up too
+metrics.register_callback(startup_seconds, lambda: [
+    ({'component': component, 'phase': phase}, seconds)
+    for component, timer in (('app', startup_timer), ('DataProcessor', models.current.data_processor.timer))
+    for phase, seconds in list(timer.phases.items())
+])
+metrics.register_callback(metrics.gauge('model_info', 'Active model bundle version', ['version']),
+                          lambda: [({'version': models.current.version}, 1)])
+metrics.register_callback(metrics.counter('model_reloads_total', 'Completed model reloads', []),
+                          lambda: [({}, models.reloads)])
+metrics.register_callback(metrics.gauge('model_reload_seconds', 'Duration of the last model reload', []),
+                          lambda: [({}, models.last_reload['seconds'])]
+                          if models.last_reload and 'seconds' in models.last_reload else [])
+metrics.register_callback(metrics.gauge('process_memory_bytes', 'Memory of this worker process by kind', ['kind']),
+                          lambda: [({'kind': kind}, value) for kind, value in memory_usage().items()])
+
+def cache_stats():
+    stats = {'result': result_cache.stats()}
+    text_normalizer = models.current.text_normalizer
+    for name, cache_stats in (text_normalizer.stats() if text_normalizer else {}).items():
+        stats[name] = cache_stats
+    return stats
+
+metrics.register_callback(metrics.counter('cache_hits_total', 'Cache hits', ['cache']),
+                          lambda: [({'cache': name}, s['hits']) for name, s in cache_stats().items()])
+metrics.register_callback(metrics.counter('cache_misses_total', 'Cache misses', ['cache']),
+                          lambda: [({'cache': name}, s['misses']) for name, s in cache_stats().items()])
+metrics.register_callback(metrics.gauge('cache_hit_ratio', 'Cache hit ratio since startup', ['cache']),
+                          lambda: [({'cache': name}, s['hit_ratio']) for name, s in cache_stats().items()])
+
+@app.before_request
+def start_request():
+    g.start = time.perf_counter()
+    # The bundle this request is served from, even if a reload swaps in a new one meanwhile
+    g.bundle = models.current
+    g.timer = PhaseTimer(request.endpoint) if metrics_enabled or request_timing else NULL_TIMER
+    if profile_dir and request.headers.get('X-Profile'):
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def finish_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    timer = g.get('timer', NULL_TIMER)
+    
+    # The profile itself is saved by end_request, which runs even when this hook doesn't
+    profiler = g.get('profiler')
+    if profiler is not None:
+        response.headers['X-Profile-File'] = os.path.basename(profiler.path(profile_dir, endpoint))
+    
+    if metrics_enabled:
+        request_latency.observe(time.perf_counter() - g.get('start', time.perf_counter()), endpoint=endpoint)
+        requests_total.inc(endpoint=endpoint, status=response.status_code)
+        for stage, seconds in timer.phases.items():
+            stage_latency.observe(seconds, endpoint=endpoint, stage=stage)
+        for item, count in timer.counts.items():
+            request_items.observe(count, endpoint=endpoint, item=item)
+    
+    if request_timing and timer.phases:
+        response.headers['Server-Timing'] = timer.server_timing()
+        logger.info(timer.summary())
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        endpoint = request.endpoint or 'unmatched'
+        path = profiler.stop().save(profile_dir, endpoint)
+        logger.info("Saved %d profile samples of %s to %s", sum(profiler.samples.values()), endpoint, path)
+
+def prerendered_json():
+    """The prerendered bodies are compact JSON: serve them only when jsonify would write the same (not in debug mode)"""
+    compact = app.json.compact
+    return compact if compact is not None else not app.debug
 
 @app.route('/manifest.json')
 def manifest():
@@ -34,26 +194,20 @@ def manifest():
 def home():
     return render_template('index.html')
 
-@app.route('/api/all_symptoms', methods=['POST'])
+@app.route('/api/all_symptoms', methods=['GET', 'POST'])
 def get_all_symptoms():
-    all_symptoms = data_processor.get_all_symptoms()
-    
-    return jsonify({
-        'all_symptoms' : all_symptoms
-    })
+    if not prerendered_json():
+        return jsonify(g.bundle.all_symptoms_response.payload)
+    return g.bundle.all_symptoms_response.to_response(request)
     
-@app.route('/api/diseases', methods=['POST'])
+@app.route('/api/diseases', methods=['GET', 'POST'])
 def get_diseases_w_description():
-    all_diseases_w_descripton = disease_processor.get_all_disease()
-    
-    result = []
-    for disease, description in all_diseases_w_descripton.items():
-        result.append({"disease": disease,
-                       "description": description})
-    
-    return jsonify(result)
+    if not prerendered_json():
+        return jsonify(g.bundle.diseases_response.payload)
+    return g.bundle.diseases_response.to_response(request)
     
 @app.route('/api/related_symptoms', methods=['POST'])
+@requires_nlp_models
 def get_related_symptoms():
     """Get related symptoms"""
     data = request.json
@@ -63,60 +217,115 @@ def get_related_symptoms():
     if not symptom:
         return jsonify({'error': 'No Symptom Provided'}), 400
     
+    cache_key = result_cache.key('related_symptoms', symptom, version=g.bundle.version, top_n=10)
+    response = result_cache.get(cache_key)
+    if response is None:
+        response = related_symptoms_for(symptom, g.timer, g.bundle)
+        result_cache.put(cache_key, response)
+    # The key ignores surrounding whitespace, so the cached result may echo another spelling:
+    # echo this request's on a copy
+    response = dict(response, symptom=symptom)
+
+    with g.timer.phase('serialize'):
+        return jsonify(response)
+
+def related_symptoms_for(symptom, timer=NULL_TIMER, bundle=None):
+    """Uncached /api/related_symptoms response body"""
+    bundle = bundle or models.current
+    # Misspelled and variant names resolve to the closest symptom (see utils/fuzzy_index.py)
+    with timer.phase('resolve'):
+        resolved = bundle.symptom_index.lookup(symptom)
+    if resolved is None:
+        return {
+            'symptom': symptom,
+            'resolved_symptom': None,
+            'edit_distance': None,
+            'cooccurence_related': [],
+            'semantic_related': []
+        }
+    symptom_id, distance = resolved
+
     # Get related symptom using both models
-    cooccurence_symptoms = data_processor.get_related_symptoms(symptom, top_n=10)
+    with timer.phase('cooccurence'):
+        cooccurence_symptoms = bundle.data_processor.get_related_symptoms(symptom_id, top_n=10)
 
-    semantic_symptoms = []
-    similar_symptoms = symptom_similarity_model.get_similar_symptoms(symptom, top_n=10)
-    for symptom, score in similar_symptoms:
-        semantic_symptoms.append({'symptom': symptom, 'score': float(score)})
+    with timer.phase('semantic'):
+        semantic_symptoms = []
+        similar_symptoms = bundle.symptom_similarity_model.get_similar_symptoms(symptom_id, top_n=10)
+        for similar_symptom, score in similar_symptoms:
+            semantic_symptoms.append({'symptom': similar_symptom, 'score': float(score)})
 
-    return jsonify({
+    return {
         'symptom': symptom,
+        'resolved_symptom': bundle.data_processor.vocabulary.name_of(symptom_id),
+        'edit_distance': distance,
         'cooccurence_related': cooccurence_symptoms,
         'semantic_related': semantic_symptoms
-    })
+    }
 
 
 @app.route('/api/analyze_text', methods=['POST'])
+@requires_nlp_models
 def analyze_text():
     """Analyze user text and extract symptoms"""
     data = request.json
     text = data.get('text')
     
-    print(f"Analyzing text: {text}")
+    logger.debug("Analyzing text: %s", text)
 
     if not text:
         return jsonify({'error': 'No TEXT provided'}), 400
     
+    bundle = g.bundle
+    text_analyzer = bundle.text_analyzer
+    
+    # Candidate extractor, selectable per request
+    mode = data.get('mode', text_analyzer.extraction_mode)
+    if mode not in text_analyzer.EXTRACTION_MODES:
+        return jsonify({'error': f"Unknown mode, expected one of {list(text_analyzer.EXTRACTION_MODES)}"}), 400
+    
+    timer = g.timer
+    
+    cache_key = result_cache.key('analyze_text', text, version=bundle.version, mode=mode, top_n=10, limit=8)
+    response = result_cache.get(cache_key)
+    if response is None:
+        response = analyze_text_for(text, mode, timer, bundle)
+        result_cache.put(cache_key, response)
+    else:
+        logger.debug("Result cache hit")
+    # The in-process cache keeps the dict itself: copy before adding request-specific fields
+    response = dict(response)
+    
+    # Optional character spans of the direct matches, for highlighting them in the UI
+    if data.get('include_spans'):
+        with timer.phase('direct'):
+            response['direct_match_spans'] = text_analyzer.find_keyword_spans(text)
+    
+    # Same bytes as jsonify, from the bundle's prerendered fragments
+    with timer.phase('serialize'):
+        if not prerendered_json():
+            return jsonify(response)
+        encoder = bundle.response_encoder
+        return encoder.to_response(encoder.encode(response))
+
+def analyze_text_for(text, mode, timer=NULL_TIMER, bundle=None):
+    """Uncached /api/analyze_text response body (without the optional spans)"""
+    bundle = bundle or models.current
+    text_analyzer = bundle.text_analyzer
+    analysis_pipeline = bundle.analysis_pipeline
+    
     # Extract symptoms from text
-    extracted_symptoms = text_analyzer.extract_symptoms(text, top_n=10)
-    print(f"Extracted symptoms with scores: {extracted_symptoms}")
+    extracted_symptoms = text_analyzer.extract_symptoms(text, top_n=10, mode=mode, timer=timer)
+    logger.debug("Extracted symptoms with scores: %s", extracted_symptoms)
 
-    # Check for direct keywords
-    direct_matches = text_analyzer.direct_keyword_match(text)
-    print(f"Direct matches: {direct_matches}")
+    with timer.phase('direct'):
+        # Check for direct keywords
+        direct_matches = text_analyzer.direct_keyword_match(text)
 
-    # Combine the results
-    results = []
-    for symptom, score in extracted_symptoms:
-        result = {
-            'symptom': symptom,
-            'confidence': float(score),
-            'is_direct_match': symptom in direct_matches
-        }
-        results.append(result)
-    
-    # If there are direct matches not in extracted symptoms
-    for symptom in direct_matches:
-        if symptom not in [r['symptom'] for r in results]:
-            results.append({
-                'symptom': symptom,
-                'confidence': 1.0,
-                'is_direct_match': True
-            })
-    
-    print(f"Combined symptom results: {results}")
+        # Combine the results
+        results = analysis_pipeline.combine_symptoms(extracted_symptoms, direct_matches)
+    logger.debug("Direct matches: %s", direct_matches)
+    logger.debug("Combined symptom results: %s", results)
     
     possible_diseases = {}
     disease_details = []
@@ -125,44 +334,108 @@ def analyze_text():
         # Get list of identified symptoms
         extracted_symptom_names = [r['symptom'] for r in results]
         
-        print(f"Sending symptoms to get_possible_diseases: {extracted_symptom_names}")
+        logger.debug("Sending symptoms to get_possible_diseases: %s", extracted_symptom_names)
         
-        # Get possible diseases from data processor
-        disease_scores = data_processor.get_possible_diseases(extracted_symptom_names)
-        
-        print(f"Received disease scores (percentages): {disease_scores}")
-        
-        # Get all disease descriptions
-        all_diseases_with_descriptions = disease_processor.get_all_disease()
-        
-        # Process each disease with its score and add description
-        for disease, percentage in disease_scores.items():
-            possible_diseases[disease] = float(percentage)
-            
-            # Get description for this disease if available
-            description = all_diseases_with_descriptions.get(disease, "No description available")
+        with timer.phase('score'):
+            # Get possible diseases from data processor
+            disease_scores = bundle.data_processor.get_possible_diseases(extracted_symptom_names)
             
-            # Format the percentage to 1 decimal place
-            formatted_percentage = f"{percentage:.1f}%"
-            
-            disease_details.append({
-                "disease": disease,
-                "score": float(percentage),  # Raw score for sorting
-                "score_display": formatted_percentage,  # Formatted for display
-                "description": description
-            })
-        
-        # Sort diseases by score in descending order
-        disease_details = sorted(disease_details, key=lambda x: x["score"], reverse=True)
+            # Add descriptions and display scores, sorted by score
+            possible_diseases, disease_details = analysis_pipeline.disease_details(disease_scores)
         
-        print(f"Final disease details: {disease_details[:3]}...")  # Show first 3 for brevity
+        logger.debug("Received disease scores (percentages): %s", disease_scores)
+        logger.debug("Final disease details: %s...", disease_details[:3])  # Show first 3 for brevity
 
-    return jsonify({
+    return {
         'extracted_symptoms': results,
         'possible_diseases': possible_diseases,
         'disease_details': disease_details
+    }
+
+@app.route('/api/analyze_batch', methods=['POST'])
+@requires_nlp_models
+def analyze_batch():
+    """Analyze many texts in one request; results are returned in input order"""
+    data = request.json
+    texts = data.get('texts')
+    text_analyzer = g.bundle.text_analyzer
+    analysis_pipeline = g.bundle.analysis_pipeline
+    
+    if not isinstance(texts, list) or not texts:
+        return jsonify({'error': 'No TEXTS provided'}), 400
+    if len(texts) > analysis_pipeline.max_batch_size:
+        return jsonify({'error': f"Too many texts, the maximum batch size is {analysis_pipeline.max_batch_size}"}), 400
+    for i, text in enumerate(texts):
+        if not isinstance(text, str) or not text:
+            return jsonify({'error': f"texts[{i}] must be a non-empty string"}), 400
+    
+    mode = data.get('mode', text_analyzer.extraction_mode)
+    if mode not in text_analyzer.EXTRACTION_MODES:
+        return jsonify({'error': f"Unknown mode, expected one of {list(text_analyzer.EXTRACTION_MODES)}"}), 400
+    
+    logger.debug("Analyzing batch of %d texts", len(texts))
+    with g.timer.phase('analyze'):
+        results = analysis_pipeline.analyze_batch(texts, mode=mode, include_spans=bool(data.get('include_spans')))
+    g.timer.count('texts', len(texts))
+    
+    with g.timer.phase('serialize'):
+        if not prerendered_json():
+            return jsonify({'results': results})
+        encoder = g.bundle.response_encoder
+        return encoder.to_response(encoder.encode_batch(results))
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Cache hit ratios and this worker's memory, for tuning cache sizes and worker counts under real traffic"""
+    return jsonify({
+        'model_version': g.bundle.version,
+        'result_cache': result_cache.stats(),
+        'text_normalizer': g.bundle.text_normalizer.stats() if g.bundle.text_normalizer else {},
+        'pid': os.getpid(),
+        'memory': memory_usage()
     })
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Readiness: the catalogue routes are ready once the app is imported, the analysis routes once nlp_models is"""
+    state = nlp_models.state
+    status = {'ready': 'ok', 'loading': 'warming_up'}.get(state, 'failed')
+    return jsonify({
+        'status': status,
+        'catalogue': 'ready',
+        'nlp_models': state,
+        'model_version': g.bundle.version,
+        'startup_seconds': dict(startup_timer.phases),
+        'reload': models.status()
+    }), 503 if state == 'failed' else 200
+
+def is_admin():
+    """Admin routes are off unless REM_ADMIN_TOKEN is set, and then need it as a bearer token"""
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {admin_token}')
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def reload_models():
+    """
+    POST: rebuild the models from the files on disk in the background and swap them in
+    (?wait=1 answers once done). GET: version and duration of the last reload.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+        if not models.reload(wait=wait):
+            return jsonify({'error': 'A reload is already running', **models.status()}), 409
+        if not wait:
+            return jsonify(models.status()), 202
+    status = models.status()
+    failed = status['last_reload'] and status['last_reload']['state'] == 'failed'
+    return jsonify(status), 500 if failed and request.method == 'POST' else 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
 @app.route('/api/test_get', methods=['GET'])
 def test_get():
     return jsonify({"message": "GET request working"})
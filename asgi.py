@@ -0,0 +1,35 @@
+# ASGI entry point: the Flask routes served from bounded thread pools (uvicorn asgi:application)
+import os
+
+from app import app, metrics
+from utils.async_serving import BoundedExecutor, WSGIBridge
+
+# NLTK/sklearn work runs in the 'analysis' lane; catalogue, static and metrics routes in 'default'
+ANALYSIS_ROUTES = ('/api/analyze_text', '/api/analyze_batch', '/api/related_symptoms')
+
+analysis_workers = int(os.environ.get('REM_ASGI_WORKERS', os.cpu_count() or 1))
+lanes = {
+    'analysis': BoundedExecutor('analysis', analysis_workers,
+                                int(os.environ.get('REM_ASGI_QUEUE_DEPTH', 4 * analysis_workers))),
+    'default': BoundedExecutor('default', int(os.environ.get('REM_ASGI_IO_WORKERS', 8)),
+                               int(os.environ.get('REM_ASGI_IO_QUEUE_DEPTH', 256))),
+}
+timeouts = {
+    'analysis': float(os.environ.get('REM_ASGI_TIMEOUT', 10)),
+    'default': float(os.environ.get('REM_ASGI_IO_TIMEOUT', 5)),
+}
+
+application = WSGIBridge(app, lanes, dict.fromkeys(ANALYSIS_ROUTES, 'analysis'), 'default', timeouts,
+                         max_body_size=int(os.environ.get('REM_ASGI_MAX_BODY', 1 << 20)))
+
+def lane_stats(field):
+    return lambda: [({'lane': name}, lane.stats()[field]) for name, lane in lanes.items()]
+
+metrics.register_callback(metrics.gauge('lane_in_flight', 'Requests running or queued per ASGI lane', ['lane']),
+                          lane_stats('in_flight'))
+metrics.register_callback(metrics.gauge('lane_queued', 'Requests waiting for a worker per ASGI lane', ['lane']),
+                          lane_stats('queued'))
+metrics.register_callback(metrics.counter('lane_rejected_total', 'Requests shed with 429 per ASGI lane', ['lane']),
+                          lane_stats('rejected'))
+metrics.register_callback(metrics.counter('lane_timeouts_total', 'Requests answered 503 after timing out', ['lane']),
+                          lane_stats('timed_out'))
@@ -0,0 +1,59 @@
+# Compare two benchmarks/run.py result files
+import argparse
+import json
+import sys
+
+
+def _rows(baseline, candidate, metric):
+    """(scale, section, name, baseline value, candidate value) of every measurement present in both runs."""
+    for scale, base_results in baseline['scales'].items():
+        new_results = candidate['scales'].get(scale)
+        if new_results is None:
+            continue
+        for section in ('cold_start', 'warm_start', 'startup'):
+            # 'startup' (time to first request) is missing from results of older revisions
+            for name, seconds in base_results.get(section, {}).items():
+                if name in new_results.get(section, {}):
+                    yield scale, section, name, seconds * 1000, new_results[section][name] * 1000
+        for section in ('methods', 'routes'):
+            for name, stats in base_results[section].items():
+                if name in new_results[section]:
+                    yield scale, section, name, stats[metric], new_results[section][name][metric]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--metric', default='p50_ms', choices=['mean_ms', 'p50_ms', 'p90_ms', 'p99_ms'],
+                        help='latency statistic compared for methods and routes')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown reported as a regression (default 0.10 = 10%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on any regression')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('revision')}  vs  candidate {candidate['meta'].get('revision')} "
+          f"({args.metric}; cold/warm start and startup in ms)")
+    regressions = 0
+    for scale, section, name, old, new in _rows(baseline, candidate, args.metric):
+        ratio = new / old if old else float('inf')
+        flag = ''
+        if ratio > 1 + args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = '  faster'
+        print(f"{scale:>4}x {section:<10} {name:<46} {old:10.3f} -> {new:10.3f}  {ratio:6.2f}x{flag}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
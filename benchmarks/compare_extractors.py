@@ -0,0 +1,74 @@
+# Recall and latency of TextAnalyzer's 'full' vs 'fast' candidate extractors
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.narratives import generate, load_cases
+from models.text_analyzer import TextAnalyzer
+from utils.data_processing import DataProcessor
+from utils.install import NLTKLoader
+
+
+def evaluate(text_analyzer, narratives, mode, pos_tagging, top_n):
+    latencies = []
+    found = expected = 0
+    for narrative in narratives:
+        start = time.perf_counter()
+        extracted = text_analyzer.extract_symptoms(narrative['text'], top_n=top_n, mode=mode, pos_tagging=pos_tagging)
+        latencies.append(time.perf_counter() - start)
+
+        names = {symptom for symptom, _ in extracted}
+        found += sum(1 for symptom in narrative['symptoms'] if symptom in names)
+        expected += len(narrative['symptoms'])
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'pos_tagging': pos_tagging,
+        'recall': found / expected if expected else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare TextAnalyzer extraction modes on synthetic narratives.")
+    parser.add_argument('--count', type=int, default=300, help='number of narratives')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    NLTKLoader.setup_nltk_once()
+    dataset_path = os.path.join(ROOT, 'dataset', 'dataset.csv')
+    data_processor = DataProcessor(dataset_path)
+    text_analyzer = TextAnalyzer(data_processor.vocabulary)
+    narratives = generate(load_cases(dataset_path), args.count, seed=args.seed)
+
+    # Warm the normalizer caches equally for every mode before timing
+    for narrative in narratives[:20]:
+        text_analyzer.extract_symptoms(narrative['text'], mode='full')
+
+    results = [
+        evaluate(text_analyzer, narratives, 'full', True, args.top_n),
+        evaluate(text_analyzer, narratives, 'fast', False, args.top_n),
+        evaluate(text_analyzer, narratives, 'fast', True, args.top_n),
+    ]
+    for result in results:
+        print(f"{result['mode']:>4} pos={str(result['pos_tagging']):<5} recall={result['recall']:.3f} "
+              f"mean={result['mean_ms']:.2f}ms p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'count': args.count, 'seed': args.seed, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Synthetic patient narratives with known symptoms, built from dataset.csv
+import random
+
+import pandas as pd
+
+OPENERS = [
+    "Hi doctor,", "Hello.", "I need some advice.", "For the past few days things have been rough.",
+    "My partner told me to get checked.", "",
+]
+
+TEMPLATES = [
+    "I have {s}.",
+    "I've been dealing with {s} for {n} days.",
+    "There is some {s} as well.",
+    "Since {day} I noticed {s}.",
+    "The {s} gets worse at night.",
+    "I am also suffering from {s}.",
+    "Lately there's been {s}, which is new for me.",
+    "My main problem is {s}.",
+]
+
+FILLERS = [
+    "I went to work anyway.", "I tried resting but it did not help much.",
+    "My family has no history of this.", "I drank a lot of water.", "Sleep has been okay otherwise.",
+]
+
+DAYS = ["monday", "tuesday", "last week", "the weekend", "yesterday"]
+
+
+def load_cases(dataset_path):
+    """(disease, [symptoms]) for every dataset row, with symptoms cleaned like DataProcessor does."""
+    df = pd.read_csv(dataset_path)
+    symptom_columns = [col for col in df.columns if col.startswith('Symptom_')]
+    cases = []
+    for disease, *cells in df[['Disease'] + symptom_columns].itertuples(index=False):
+        symptoms = [cell.replace('_', ' ').lstrip().lower() for cell in cells if isinstance(cell, str)]
+        cases.append((disease, symptoms))
+    return cases
+
+
+def generate(cases, count, seed=0, min_symptoms=2, max_symptoms=4, filler_rate=0.3):
+    """
+    Generate narratives.
+
+    Returns:
+        List of {'text', 'disease', 'symptoms'} dicts; 'symptoms' are the ones mentioned in the text
+    """
+    rng = random.Random(seed)
+    narratives = []
+    for _ in range(count):
+        disease, symptoms = rng.choice(cases)
+        mentioned = rng.sample(symptoms, min(len(symptoms), rng.randint(min_symptoms, max_symptoms)))
+        sentences = [rng.choice(OPENERS)]
+        for symptom in mentioned:
+            sentences.append(rng.choice(TEMPLATES).format(s=symptom, n=rng.randint(2, 9), day=rng.choice(DAYS)))
+            if rng.random() < filler_rate:
+                sentences.append(rng.choice(FILLERS))
+        narratives.append({
+            'text': ' '.join(sentence for sentence in sentences if sentence),
+            'disease': disease,
+            'symptoms': mentioned,
+        })
+    return narratives
@@ -0,0 +1,283 @@
+# Benchmark harness: cold start, public methods and Flask routes, at several dataset scales
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.scaling import scale_dataset
+
+DATASET_DIR = os.path.join(ROOT, 'dataset')
+
+
+def summarize(latencies, items_per_call=1):
+    """Latency percentiles (ms) and throughput (items/s) of a list of per-call seconds."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        'calls': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1000,
+        'throughput_per_s': len(ordered) * items_per_call / total if total else 0.0,
+    }
+
+
+def measure(fn, inputs, warmup, items_per_call=1):
+    """Call fn on every input (after warming up on the first few) and summarize the latencies."""
+    for arg in inputs[:warmup]:
+        fn(arg)
+    latencies = []
+    for arg in inputs:
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, items_per_call)
+
+
+def timed(results, label, fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    results[label] = time.perf_counter() - start
+    return value
+
+
+def run_child(data_dir, count, warmup, batch_size, seed):
+    """
+    Measure one dataset directory in this (fresh) process; REM_DATA_DIR must already point at it.
+
+    Returns:
+        Dict with 'dataset', 'cold_start', 'methods' and 'routes' sections
+    """
+    cold = {}
+    start = time.perf_counter()
+    import nltk  # noqa: F401
+    import pandas  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+    cold['imports'] = time.perf_counter() - start
+
+    from benchmarks.narratives import generate, load_cases
+    from models.symptom_embeddings import SymptomEmbeddingStore
+    from utils.data_processing import DataProcessor
+    from utils.disease_processor import DiseaseProcessor
+    from utils.install import NLTKLoader
+    from utils.knowledge_base import KnowledgeBase
+
+    dataset_path = os.path.join(data_dir, 'dataset.csv')
+    diseases_path = os.path.join(data_dir, 'diseases.csv')
+    snapshot_path = os.path.join(data_dir, 'knowledge_base.npz')
+
+    # Cold path: everything derived from the CSVs
+    timed(cold, 'nltk_setup', NLTKLoader.setup_nltk_once)
+    data_processor = timed(cold, 'data_processor', DataProcessor, dataset_path)
+    for phase, seconds in data_processor.timer.phases.items():
+        cold[f'data_processor.{phase}'] = seconds
+    timed(cold, 'disease_processor', DiseaseProcessor, diseases_path)
+    timed(cold, 'embeddings_fit', SymptomEmbeddingStore, data_processor.vocabulary)
+    knowledge_base = timed(cold, 'knowledge_base_compile', KnowledgeBase.compile, dataset_path, diseases_path)
+    timed(cold, 'knowledge_base_save', knowledge_base.save, snapshot_path)
+
+    # Warm path: what the app does at startup once the snapshot exists
+    warm = {}
+    knowledge_base = timed(warm, 'knowledge_base_load', KnowledgeBase.load, snapshot_path)
+    timed(warm, 'data_processor', DataProcessor, dataset_path, knowledge_base=knowledge_base)
+    start = time.perf_counter()
+    import app
+    warm['app_import'] = time.perf_counter() - start
+    for phase, seconds in app.startup_timer.phases.items():
+        warm[f'app.{phase}'] = seconds
+
+    rng = random.Random(seed)
+    narratives = generate(load_cases(dataset_path), count, seed=seed)
+    texts = [narrative['text'] for narrative in narratives]
+    symptom_sets = [narrative['symptoms'] for narrative in narratives]
+    bundle = app.models.current
+    symptoms = [rng.choice(bundle.data_processor.symptom_list) for _ in range(count)]
+    text_batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    symptom_batches = [symptom_sets[i:i + batch_size] for i in range(0, len(symptom_sets), batch_size)]
+    batch_warmup = max(1, warmup // batch_size)
+
+    text_analyzer = bundle.text_analyzer
+    data_processor = bundle.data_processor
+    responses = bundle.analysis_pipeline.analyze_batch(texts[:bundle.analysis_pipeline.max_batch_size])
+    methods = {
+        'TextAnalyzer.extract_symptoms[full]': measure(
+            lambda text: text_analyzer.extract_symptoms(text, top_n=10, mode='full'), texts, warmup),
+        'TextAnalyzer.extract_symptoms[fast]': measure(
+            lambda text: text_analyzer.extract_symptoms(text, top_n=10, mode='fast'), texts, warmup),
+        'TextAnalyzer.extract_symptoms_batch': measure(
+            lambda batch: text_analyzer.extract_symptoms_batch(batch, top_n=10), text_batches, batch_warmup,
+            items_per_call=batch_size),
+        'TextAnalyzer.direct_keyword_match': measure(text_analyzer.direct_keyword_match, texts, warmup),
+        'SymptomSimilarity.get_similar_symptoms': measure(
+            lambda symptom: bundle.symptom_similarity_model.get_similar_symptoms(symptom, top_n=10), symptoms, warmup),
+        'DataProcessor.get_related_symptoms': measure(
+            lambda symptom: data_processor.get_related_symptoms(symptom, top_n=10), symptoms, warmup),
+        'DataProcessor.get_possible_diseases': measure(data_processor.get_possible_diseases, symptom_sets, warmup),
+        'DataProcessor.get_possible_diseases[compat]': measure(
+            lambda symptom_set: data_processor.get_possible_diseases(symptom_set, compat=True), symptom_sets, warmup),
+        'DataProcessor.get_possible_diseases_batch': measure(
+            data_processor.get_possible_diseases_batch, symptom_batches, batch_warmup, items_per_call=batch_size),
+        'AnalysisResponseEncoder.encode': measure(bundle.response_encoder.encode, responses, warmup),
+        # One character dropped from the middle of every symptom name
+        'FuzzyIndex.lookup': measure(
+            bundle.symptom_index.lookup, [symptom[:len(symptom) // 2] + symptom[len(symptom) // 2 + 1:]
+                                          for symptom in symptoms], warmup),
+    }
+
+    client = app.app.test_client()
+
+    def check(response):
+        if response.status_code not in (200, 304):
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+
+    routes = {
+        'POST /api/analyze_text': measure(
+            lambda text: check(client.post('/api/analyze_text', json={'text': text})), texts, warmup),
+        'POST /api/analyze_batch': measure(
+            lambda batch: check(client.post('/api/analyze_batch', json={'texts': batch})), text_batches,
+            batch_warmup, items_per_call=batch_size),
+        'POST /api/related_symptoms': measure(
+            lambda symptom: check(client.post('/api/related_symptoms', json={'symptom': symptom})), symptoms, warmup),
+        'GET /api/all_symptoms': measure(lambda _: check(client.get('/api/all_symptoms')), range(count), warmup),
+        'GET /api/diseases': measure(lambda _: check(client.get('/api/diseases')), range(count), warmup),
+        'GET /metrics': measure(lambda _: check(client.get('/metrics')), range(count), warmup),
+    }
+
+    return {
+        'dataset': {
+            'rows': len(data_processor.row_diseases),
+            'diseases': len(data_processor.disease_list),
+            'symptoms': len(data_processor.symptom_list),
+        },
+        'cold_start': cold,
+        'warm_start': warm,
+        'methods': methods,
+        'routes': routes,
+    }
+
+
+def run_startup_probe():
+    """
+    Seconds from the start of `import app` to the end of the import and of the first catalogue
+    and analysis responses, in this (fresh) process; REM_DATA_DIR and REM_WARMUP must already be set.
+    """
+    start = time.perf_counter()
+    import app
+    results = {'import': time.perf_counter() - start}
+
+    client = app.app.test_client()
+    for label, send in (('first_catalogue', lambda: client.get('/api/all_symptoms')),
+                        ('first_analysis', lambda: client.post('/api/analyze_text', json={
+                            'text': 'I have a mild headache and a persistent cough'}))):
+        response = send()
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+        results[label] = time.perf_counter() - start
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark startup, the public methods and the Flask routes at several dataset scales.')
+    parser.add_argument('--scales', default='1,10', help='comma separated dataset scale factors, e.g. 1,10,100')
+    parser.add_argument('--count', type=int, default=300, help='calls per method/route')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed calls before measuring')
+    parser.add_argument('--batch-size', type=int, default=32, help='texts per batch call')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/<revision>-<time>.json)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_probe:
+        json.dump(run_startup_probe(), sys.stdout)
+        return
+    if args.child:
+        results = run_child(args.child, args.count, args.warmup, args.batch_size, args.seed)
+        json.dump(results, sys.stdout)
+        return
+
+    revision = git_revision()
+    report = {
+        'meta': {
+            'revision': revision,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'count': args.count,
+            'warmup': args.warmup,
+            'batch_size': args.batch_size,
+            'seed': args.seed,
+        },
+        'scales': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix='rem-bench-') as work_dir:
+        for scale in (int(scale) for scale in args.scales.split(',')):
+            data_dir = scale_dataset(DATASET_DIR, os.path.join(work_dir, f'x{scale}'), scale)
+            # Every scale runs in a fresh interpreter so cold start numbers include imports.
+            # The result cache is disabled so repeated inputs measure the real work.
+            env = dict(os.environ, REM_DATA_DIR=data_dir, REM_CACHE_SIZE='0', REM_LOG_LEVEL='WARNING', REM_WARMUP='eager')
+            print(f"Benchmarking {scale}x ...", file=sys.stderr)
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', data_dir, '--count', str(args.count),
+                 '--warmup', str(args.warmup), '--batch-size', str(args.batch_size), '--seed', str(args.seed)],
+                env=env, cwd=ROOT, stdout=subprocess.PIPE, check=True)
+            results = report['scales'][str(scale)] = json.loads(child.stdout)
+
+            # Import time and time to first request of each warm-up mode, against the snapshot built above
+            results['startup'] = {}
+            for mode in ('eager', 'background'):
+                probe = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--startup-probe'],
+                    env=dict(env, REM_WARMUP=mode, REM_WARMUP_WAIT='600'), cwd=ROOT, stdout=subprocess.PIPE,
+                    check=True)
+                for label, seconds in json.loads(probe.stdout).items():
+                    results['startup'][f'{mode}.{label}'] = seconds
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"{revision or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for scale, results in report['scales'].items():
+        dataset = results['dataset']
+        print(f"\n{scale}x: {dataset['rows']} rows, {dataset['diseases']} diseases, {dataset['symptoms']} symptoms")
+        print(f"  cold start {sum(v for k, v in results['cold_start'].items() if '.' not in k) * 1000:.0f}ms, "
+              f"warm app import {results['warm_start']['app_import'] * 1000:.0f}ms")
+        print('  time to first request: ' + ', '.join(
+            f"{label} {seconds * 1000:.0f}ms" for label, seconds in results['startup'].items()))
+        for section in ('methods', 'routes'):
+            for name, stats in results[section].items():
+                print(f"  {name:<46} p50={stats['p50_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms "
+                      f"{stats['throughput_per_s']:10.0f}/s")
+    print(f"\nWrote {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Scaled-up copies of the dataset directory, for finding scaling limits
+import itertools
+import os
+import shutil
+
+import pandas as pd
+
+# Variant i of a symptom/disease is named with the i-th modifier combination; 20 x 20 covers 400x
+MODIFIERS = [
+    'acute', 'chronic', 'mild', 'severe', 'recurrent', 'intermittent', 'left', 'right', 'upper', 'lower',
+    'early', 'late', 'persistent', 'transient', 'bilateral', 'central', 'diffuse', 'focal', 'nocturnal', 'postural',
+]
+VARIANTS = [''] + [' '.join(pair) for pair in itertools.permutations(MODIFIERS, 2)]
+
+
+def _variant_symptom(cell, variant):
+    if not isinstance(cell, str) or not variant:
+        return cell
+    # Keep the raw dataset.csv formatting (leading space, '_' between words)
+    stripped = cell.lstrip()
+    return cell[:len(cell) - len(stripped)] + variant.replace(' ', '_') + '_' + stripped
+
+
+def scale_dataset(source_dir, target_dir, factor):
+    """
+    Write a dataset directory with factor times the diseases, symptoms and rows.
+
+    Variant i of every disease has the dataset rows of the original with every symptom renamed
+    to its i-th variant ("acute chronic itching"), so the symptom vocabulary, the disease
+    count and the row count all grow by the factor while each profile keeps its shape.
+
+    Returns:
+        target_dir
+    """
+    if not 1 <= factor <= len(VARIANTS):
+        raise ValueError(f"factor must be between 1 and {len(VARIANTS)}")
+    os.makedirs(target_dir, exist_ok=True)
+
+    dataset = pd.read_csv(os.path.join(source_dir, 'dataset.csv'))
+    diseases = pd.read_csv(os.path.join(source_dir, 'diseases.csv'))
+    symptom_columns = [col for col in dataset.columns if col.startswith('Symptom_')]
+
+    dataset_parts = []
+    disease_parts = []
+    for variant in VARIANTS[:factor]:
+        part = dataset.copy()
+        disease_part = diseases.copy()
+        if variant:
+            part['Disease'] = part['Disease'].str.strip() + f' ({variant})'
+            disease_part['Disease'] = disease_part['Disease'].str.strip() + f' ({variant})'
+            for col in symptom_columns:
+                part[col] = part[col].map(lambda cell: _variant_symptom(cell, variant))
+        dataset_parts.append(part)
+        disease_parts.append(disease_part)
+
+    pd.concat(dataset_parts).to_csv(os.path.join(target_dir, 'dataset.csv'), index=False)
+    pd.concat(disease_parts).to_csv(os.path.join(target_dir, 'diseases.csv'), index=False)
+    shutil.copy(os.path.join(source_dir, 'symptom_synonyms.csv'), os.path.join(target_dir, 'symptom_synonyms.csv'))
+    return target_dir
@@ -0,0 +1,110 @@
+# Memory per gunicorn worker, with and without preloading the app in the master
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.narratives import generate, load_cases
+from utils.memory import memory_usage
+
+MB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(url, payload=None, timeout=5):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.load(response)
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def measure(preload, workers, texts, startup_timeout):
+    """Start gunicorn, send the texts, and return the memory of the master and of every worker."""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, REM_PRELOAD='1' if preload else '0', REM_LOG_LEVEL='WARNING')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), 'app:app'], cwd=ROOT, env=env)
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                if request(f'{base}/api/health')['nlp_models'] == 'ready' and len(children(server.pid)) == workers:
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError('gunicorn did not become ready')
+            time.sleep(0.2)
+
+        # Traffic spreads over the workers, so each touches the shared models as it would in production
+        for text in texts:
+            request(f'{base}/api/analyze_text', {'text': text})
+            request(f'{base}/api/related_symptoms', {'symptom': 'itching'})
+
+        return {
+            'master': memory_usage(server.pid),
+            'workers': [memory_usage(pid) for pid in children(server.pid)],
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report memory per gunicorn worker, with and without preload.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='analyze_text requests sent before measuring')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', help='also write the measurements to this JSON file')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        parser.error('needs Linux /proc/<pid>/smaps_rollup')
+
+    texts = [narrative['text'] for narrative in
+             generate(load_cases(os.path.join(ROOT, 'dataset', 'dataset.csv')), args.requests, seed=0)]
+    report = {}
+    for preload in (True, False):
+        mode = 'preload' if preload else 'no-preload'
+        print(f"Measuring {mode} with {args.workers} workers ...", file=sys.stderr)
+        report[mode] = result = measure(preload, args.workers, texts, args.startup_timeout)
+
+        workers = result['workers']
+        total_pss = (result['master']['pss'] + sum(w['pss'] for w in workers)) / MB
+        private = sum(w['private_dirty'] + w['private_clean'] for w in workers) / len(workers) / MB
+        shared = sum(w['shared_clean'] + w['shared_dirty'] for w in workers) / len(workers) / MB
+        print(f"\n{mode}: total PSS {total_pss:.1f} MB (master + {len(workers)} workers)")
+        print(f"  per worker: private {private:.1f} MB (the cost of one more worker), "
+              f"shared with the master {shared:.1f} MB")
+        print(f"  master rss {result['master']['rss'] / MB:.1f} MB")
+        for pid_usage in workers:
+            print(f"  worker rss {pid_usage['rss'] / MB:7.1f} MB  pss {pid_usage['pss'] / MB:7.1f} MB  "
+                  f"private dirty {pid_usage['private_dirty'] / MB:7.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# build-index: compile dataset.csv and diseases.csv into the knowledge base snapshot
+import argparse
+import os
+import time
+
+from utils.install import NLTKLoader
+from utils.knowledge_base import KnowledgeBase
+from utils.logging_config import configure_logging
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATASET = os.path.join(BASE_DIR, 'dataset', 'dataset.csv')
+DEFAULT_DISEASES = os.path.join(BASE_DIR, 'dataset', 'diseases.csv')
+DEFAULT_SNAPSHOT = os.path.join(BASE_DIR, 'dataset', 'knowledge_base.npz')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='build-index',
+        description='Compile the symptom/disease CSVs into a binary knowledge base snapshot.',
+    )
+    parser.add_argument('--dataset', default=DEFAULT_DATASET, help='path of dataset.csv')
+    parser.add_argument('--diseases', default=DEFAULT_DISEASES, help='path of diseases.csv')
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT, help='where to write the .npz snapshot')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the snapshot is up to date')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    NLTKLoader.setup_nltk_once()
+
+    start = time.perf_counter()
+    if args.force:
+        knowledge_base = KnowledgeBase.compile(args.dataset, args.diseases)
+        knowledge_base.save(args.output)
+        rebuilt = True
+    else:
+        knowledge_base, rebuilt = KnowledgeBase.load_or_build(args.dataset, args.diseases, args.output, strict=True)
+    elapsed = time.perf_counter() - start
+
+    state = 'Built' if rebuilt else 'Up to date'
+    print(f"{state}: {args.output} (source {knowledge_base.source_hash[:12]}, "
+          f"{len(knowledge_base['symptom_list'])} symptoms, {len(knowledge_base['disease_list'])} diseases) "
+          f"in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# gunicorn serving configuration: the models are loaded once in the master and shared by the workers
+#   gunicorn -c gunicorn.conf.py app:app
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('REM_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('REM_WORKERS', multiprocessing.cpu_count()))
+
+# Import app.py (snapshot, models, precomputed responses) once in the master; workers fork from it and
+# inherit everything copy-on-write. REM_PRELOAD=0 loads the app in every worker instead
+preload_app = os.environ.get('REM_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+if preload_app:
+    # A background warm-up thread would not survive the fork: load everything before forking
+    os.environ['REM_WARMUP'] = 'eager'
+    # No collections while loading, so freed objects leave no holes in the pages the workers share
+    gc.disable()
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before the first worker is forked"""
+    if not preload_app:
+        return
+    app_module = sys.modules.get('app')
+    if app_module is not None and app_module.models.current.text_analyzer is not None:
+        # Load punkt, the POS tagger and WordNet once here instead of in every worker
+        app_module.models.current.text_analyzer.warm_up()
+    # Move every object allocated so far out of the collector's reach: collections in the workers
+    # would otherwise write to the GC headers of inherited objects and un-share their pages
+    gc.freeze()
+    gc.enable()
@@ -0,0 +1,66 @@
+# models/symptom_embeddings.py
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from utils.neighbours import top_k_similar
+from utils.text_normalizer import TextNormalizer
+from utils.vocabulary import Vocabulary
+
+class SymptomEmbeddingStore:
+    def __init__(self, symptom_list, vectorizer=None, symptom_vectors=None, normalizer=None, top_k=20,
+                 neighbour_table=None):
+        """TF-IDF embeddings of the symptom vocabulary, shared by TextAnalyzer and SymptomSimilarity.
+
+        symptom_list may be the shared Vocabulary (preferred) or a plain list of names.
+        A vectorizer and symptom_vectors restored from a KnowledgeBase snapshot
+        can be passed in to skip fitting the TF-IDF model, and its (indices, scores)
+        neighbour_table to skip computing the table.
+        top_k is the number of most similar symptoms precomputed for every symptom.
+        """
+        if not isinstance(symptom_list, Vocabulary):
+            symptom_list = Vocabulary(symptom_list, sort=False)
+        self.vocabulary = symptom_list
+        self.symptom_list = self.vocabulary.names
+        self.normalizer = normalizer or TextNormalizer()
+
+        if vectorizer is None or symptom_vectors is None:
+            vectorizer = TfidfVectorizer()
+            symptom_vectors = vectorizer.fit_transform([self.preprocess(symptom) for symptom in self.symptom_list])
+        self.vectorizer = vectorizer
+        self.vectors = csr_matrix(symptom_vectors)
+
+        # L2-normalized rows (cosine = dot product), and their transpose for phrases x symptoms products
+        self.normalized = normalize(self.vectors).tocsr()
+        self.normalized_t = self.normalized.T.tocsr()
+
+        # Most similar other symptoms of every symptom, best first (index -1 pads rows with fewer)
+        if neighbour_table is None:
+            neighbour_table = top_k_similar(self.normalized, top_k)
+        self.neighbour_indices, self.neighbour_scores = neighbour_table
+        self.top_k = self.neighbour_indices.shape[1]
+
+    def preprocess(self, text):
+        """Normalize text the way the symptom names were normalized before fitting"""
+        return self.normalizer.normalize(text)
+
+    def embed(self, processed_texts):
+        """L2-normalized TF-IDF vectors of already preprocessed texts (one transform call)."""
+        return normalize(self.vectorizer.transform(processed_texts))
+
+    def similarities(self, vectors):
+        """Dense (rows x symptoms) cosine similarities of L2-normalized vectors, in one sparse product."""
+        return (vectors @ self.normalized_t).toarray()
+
+    def neighbours(self, symptom_id, top_n):
+        """
+        Most similar other symptoms of one symptom, from the precomputed table.
+
+        Returns:
+            List of (symptom id, similarity) with positive similarity, best first; None if top_n > top_k
+        """
+        if top_n > self.top_k:
+            return None
+        indices = self.neighbour_indices[symptom_id, :top_n].tolist()
+        scores = self.neighbour_scores[symptom_id, :top_n].tolist()
+        return [(i, score) for i, score in zip(indices, scores) if i >= 0 and score > 0]
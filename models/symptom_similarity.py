@@ -1,47 +1,31 @@
 # models/symptom_similarity.py
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import string
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
 
-class SymptomSimilarity:
-    def __init__(self, symptom_list):
-        """Initialize the symptom similarity model with a list of symptoms."""
-        self.symptom_list = symptom_list
-        self.vectorizer = None
-        self.symptom_vectors = None
+from models.symptom_embeddings import SymptomEmbeddingStore
 
-        self.stopwords = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+class SymptomSimilarity:
+    def __init__(self, symptom_list, vectorizer=None, symptom_vectors=None, normalizer=None, embeddings=None):
+        """Initialize the symptom similarity model with a list of symptoms.
 
-        # Preprocess symptoms and create vectors
-        self._preprocess_symptoms()
+        embeddings is the SymptomEmbeddingStore shared with TextAnalyzer (preferred);
+        without it a private store is built from symptom_list (a Vocabulary or a plain list),
+        the optional vectorizer/symptom_vectors of a KnowledgeBase snapshot and normalizer.
+        """
+        if embeddings is None:
+            embeddings = SymptomEmbeddingStore(symptom_list, vectorizer=vectorizer,
+                                               symptom_vectors=symptom_vectors, normalizer=normalizer)
+        self.embeddings = embeddings
+        self.vocabulary = embeddings.vocabulary
+        self.symptom_list = embeddings.symptom_list
+        self.vectorizer = embeddings.vectorizer
+        self.symptom_vectors = embeddings.vectors
+        self.normalizer = embeddings.normalizer
 
     def _preprocess_text(self, text):
-        """Preprocess text by tokenizing, removing stopwords, and lemmatizing"""
-        text = text.lower()
-        text = ''.join([char for char in text if char not in string.punctuation])
-
-        # Remove stopwords and tokenize
-        tokens = nltk.word_tokenize(text)
-        tokens = [word for word in tokens if word not in self.stopwords]
-
-        # Lemmatization purposes
-        lemmatized = [self.lemmatizer.lemmatize(word) for word in tokens]
-
-        return ' '.join(lemmatized)
-
-    def _preprocess_symptoms(self):
-        """Preprocess all symptoms and vectorize them."""
-        # Preprocess all symptoms
-        processed_symptoms = [self._preprocess_text(symptom) for symptom in self.symptom_list]
-
-        # Create TF-IDF vectors
-        self.vectorizer = TfidfVectorizer()
-        self.symptom_vectors = self.vectorizer.fit_transform(processed_symptoms)
+        """Preprocess text by tokenizing, removing stopwords, and lemmatizing (cached, shared)"""
+        return self.embeddings.preprocess(text)
 
     def find_similar_symptoms(self, input_text, top_n=5):
         """
@@ -54,17 +38,18 @@ class SymptomSimilarity:
         Returns:
             List of similar symptoms
         """
-        # Preprocess input text
-        processed_text = self._preprocess_text(input_text)
-
-        # Vectorize input text
-        input_vector = self.vectorizer.transform([processed_text])
+        # Preprocess and vectorize input text
+        input_vector = self.embeddings.embed([self._preprocess_text(input_text)])
 
-        # Calculate similarity
-        similarities = cosine_similarity(input_vector, self.symptom_vectors)[0]
+        # Calculate similarity against the shared normalized matrix
+        similarities = self.embeddings.similarities(input_vector)[0]
 
         # Get top similar symptoms
-        top_indices = np.argsort(similarities)[::-1][:top_n]
+        top_n = min(top_n, len(similarities))
+        if top_n <= 0:
+            return []
+        top_indices = np.argpartition(-similarities, top_n - 1)[:top_n]
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind='stable')]
         top_symptoms = [(self.symptom_list[i], similarities[i]) for i in top_indices if similarities[i] > 0]
 
         return top_symptoms
@@ -73,43 +58,43 @@ class SymptomSimilarity:
         """Find symptoms similar to a given symptom.
             
             Args: 
-                symptom: Target symptom
+                symptom: Target symptom (name or vocabulary id), or a list of them
                 top_n: Number of similar symptoms to return
                 
             Returns:
                 List of top symptom based on top_n
             
         """
-        if isinstance(symptoms, str):
+        if isinstance(symptoms, (str, int, np.integer)):
             symptoms = [symptoms]
 
-        indices = [self.symptom_list.index(s) for s in symptoms if s in self.symptom_list]
+        indices = self.vocabulary.ids_of(symptoms)
         if not indices:
             return []
 
-        # Sum the vectors for the given symptoms
-        target_vector = np.sum(self.symptom_vectors[indices], axis=0)
+        # A single symptom's neighbours never change: answer from the precomputed table
+        if len(set(indices)) == 1:
+            neighbours = self.embeddings.neighbours(indices[0], top_n)
+            if neighbours is not None:
+                return [(self.symptom_list[i], score) for i, score in neighbours]
 
-        # Ensure target_vector is a 2D numpy array
-        if hasattr(target_vector, "toarray"):
-            target_vector = target_vector.toarray()
-        else:
-            target_vector = np.asarray(target_vector)
-            if target_vector.ndim == 1:
-                target_vector = target_vector.reshape(1, -1)
-
-        # Calculate similarity with all symptoms
-        similarities = cosine_similarity(target_vector, self.symptom_vectors)[0]
+        # Sum the vectors for the given symptoms (sparse), normalize and take cosine similarities
+        # in one sparse product: only symptoms sharing a term with the query are ever touched
+        weights = csr_matrix(np.ones((1, len(indices))))
+        target_vector = normalize(weights @ self.embeddings.normalized[indices])
+        similarities = (target_vector @ self.embeddings.normalized_t).tocsr()
+        candidates, scores = similarities.indices, similarities.data
 
         # Exclude the input symptoms themselves
-        exclude_set = set(symptoms)
-        top_indices = np.argsort(similarities)[::-1]
-
-        similar_symptoms = []
-        for idx in top_indices:
-            if self.symptom_list[idx] not in exclude_set and similarities[idx] > 0:
-                similar_symptoms.append((self.symptom_list[idx], similarities[idx]))
-                if len(similar_symptoms) >= top_n:
-                    break
-
-        return similar_symptoms
+        keep = ~np.isin(candidates, indices) & (scores > 0)
+        candidates, scores = candidates[keep], scores[keep]
+
+        # Best first, ties by descending id as a reversed stable argsort orders them; everything tied
+        # with the top_n-th score is kept until the sort, so the cut matches that order too
+        if len(candidates) > top_n:
+            kth = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+            keep = scores >= kth
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((-candidates, -scores))[:top_n]
+
+        return [(self.symptom_list[i], score) for i, score in zip(candidates[order].tolist(), scores[order].tolist())]
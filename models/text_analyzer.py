@@ -1,20 +1,46 @@
 # models/text_analyzer.py
 import nltk
 from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import stopwords
-import string
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import csv
+from functools import cached_property
+
+from models.symptom_embeddings import SymptomEmbeddingStore
+from utils.keyword_automaton import KeywordAutomaton
+from utils.timing import NULL_TIMER
+
+# Fast extraction splits clauses and words with plain regexes instead of punkt/word_tokenize
+_CLAUSE_BREAK = re.compile(r'[.!?;,\n]+')
+_WORD = re.compile(r'[a-z0-9]+')
 
 class TextAnalyzer:
-    def __init__(self, symptom_list):
-        """Initialize the text analyzer with a list of symptoms."""
-        self.symptom_list = symptom_list
-        self.stopwords = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+    # 'full': per-keyword regexes, punkt sentences and POS-tagged noun phrases (the original extractor)
+    # 'fast': one keyword regex plus n-grams built only from words the TF-IDF model knows
+    EXTRACTION_MODES = ('full', 'fast')
+    
+    def __init__(self, symptom_list, vectorizer=None, symptom_vectors=None, synonyms=None, normalizer=None,
+                 extraction_mode='full', embeddings=None):
+        """Initialize the text analyzer with a list of symptoms.
+        
+        embeddings is the SymptomEmbeddingStore shared with SymptomSimilarity (preferred);
+        without it a private store is built from symptom_list (a Vocabulary or a plain list),
+        the optional vectorizer/symptom_vectors of a KnowledgeBase snapshot and normalizer.
+        synonyms is an optional {lay term: symptom} dict used by direct keyword matching.
+        extraction_mode is the default candidate extractor, see EXTRACTION_MODES.
+        """
+        if extraction_mode not in self.EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+        self.extraction_mode = extraction_mode
+        if embeddings is None:
+            embeddings = SymptomEmbeddingStore(symptom_list, vectorizer=vectorizer,
+                                               symptom_vectors=symptom_vectors, normalizer=normalizer)
+        self.embeddings = embeddings
+        self.vocabulary = embeddings.vocabulary
+        self.symptom_list = embeddings.symptom_list
+        self.vectorizer = embeddings.vectorizer
+        self.symptom_vectors = embeddings.vectors
+        self.normalizer = embeddings.normalizer
         
         # Common symptom-related keywords
         self.symptom_keywords = [
@@ -24,138 +50,322 @@ class TextAnalyzer:
             'constant', 'intermittent', 'occasional', 'frequent', 'persistent'
         ]
         
-        self._prepare_symptom_vectors()
-    
-    def _prepare_symptom_vectors(self):
-        """Create TF-IDF vectors for all symptoms."""
-        processed_symptoms = [self._preprocess_text(symptom) for symptom in self.symptom_list]
+        self.synonyms = dict(synonyms or {})
+        self.keyword_automaton = self._build_keyword_automaton()
         
-        # Create vectorizer and fit to symptom list
-        self.vectorizer = TfidfVectorizer()
-        self.symptom_vectors = self.vectorizer.fit_transform(processed_symptoms)
+        # Fast extraction: all keywords in one precompiled alternation (longest first, as the
+        # per-keyword patterns did), and the TF-IDF terms that n-gram candidates are built from
+        keywords = '|'.join(sorted(map(re.escape, self.symptom_keywords), key=len, reverse=True))
+        self._keyword_pattern = re.compile(r'(?:(?:\w+\s+){0,3})(?:' + keywords + r')(?:\s+\w+){0,5}')
+        self._tfidf_terms = frozenset(self.vectorizer.vocabulary_)
+    
+    @cached_property
+    def max_ngram(self):
+        """Most words in a normalized symptom name (computed on first use: it needs NLTK's tokenizer)"""
+        return max((len(self._preprocess_text(symptom).split()) for symptom in self.symptom_list), default=1)
+    
+    def warm_up(self):
+        """
+        Load the NLTK resources that are otherwise loaded by the first request needing them
+        (punkt, the POS tagger, WordNet for the lemmatizer) by analysing a sample text.
+        """
+        self.extract_symptoms("I have had a mild headache and a persistent cough since yesterday.", mode='full')
+        self.extract_symptoms("I have had a mild headache and a persistent cough since yesterday.", mode='fast')
+    
+    @staticmethod
+    def load_synonyms(path):
+        """Read an Alias,Symptom CSV into a {alias: symptom} dict"""
+        with open(path, newline='', encoding='utf-8') as f:
+            return {row['Alias']: row['Symptom'] for row in csv.DictReader(f)}
+    
+    def _build_keyword_automaton(self):
+        """Aho-Corasick automaton over every symptom name and every synonym, payload = symptom id."""
+        patterns = [(symptom, symptom_id) for symptom_id, symptom in enumerate(self.symptom_list)]
+        for alias, symptom in self.synonyms.items():
+            symptom_id = self.vocabulary.id_of(symptom)
+            if symptom_id is not None:
+                patterns.append((alias, symptom_id))
+        return KeywordAutomaton(patterns)
     
     def _preprocess_text(self, text):
-        """Preprocess text by tokenizing, removing stopwords, and lemmatizing."""
-        text = text.lower()
-        text = [match.replace('_', ' ') for match in text]
-        text = ''.join([char for char in text if char not in string.punctuation])
-        
-        # Tokenize and remove stopwords
-        tokens = word_tokenize(text)
-        tokens = [word for word in tokens if word not in self.stopwords]
-        
-        # Lemmatize
-        lemmatized = [self.lemmatizer.lemmatize(word) for word in tokens]
+        """Preprocess text by tokenizing, removing stopwords, and lemmatizing (cached, shared)"""
+        return self.embeddings.preprocess(text)
 
-        return ' '.join(lemmatized)
-    
-    def _extract_potential_symptoms(self, text):
-        """Extract potential symptom phrases from text."""
-        # Preprocess text
-        text = text.lower()
+    def _extract_potential_symptoms(self, text, mode='full', pos_tagging=None, timer=NULL_TIMER):
+        """
+        Extract potential symptom phrases from text.
+        
+        Args:
+            text: User input text
+            mode: 'full' or 'fast', see EXTRACTION_MODES
+            pos_tagging: also add POS-tagged noun phrases; defaults to on for 'full', off for 'fast'
+            timer: PhaseTimer receiving the 'extract' and 'pos_tag' stage durations
+        """
+        if mode not in self.EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {mode}")
+        if pos_tagging is None:
+            pos_tagging = mode == 'full'
         
-        # Split into sentences
-        sentences = sent_tokenize(text)
+        with timer.phase('extract'):
+            # Preprocess text
+            text = text.lower()
+            
+            # Split into sentences (clauses in fast mode, so n-grams never span a comma)
+            sentences = _CLAUSE_BREAK.split(text) if mode == 'fast' else sent_tokenize(text)
         potential_symptoms = []
         
         for sentence in sentences:
-            # Look for symptom-related phrases
-            for keyword in self.symptom_keywords:
-                if keyword in sentence:
-                    # Extract phrases around the keyword
-                    pattern = r'(?:(?:\w+\s+){0,3})' + keyword + r'(?:\s+\w+){0,5}'
-                    matches = re.findall(pattern, sentence)
-                    potential_symptoms.extend(matches)
+            with timer.phase('extract'):
+                if mode == 'fast':
+                    potential_symptoms.extend(self._keyword_pattern.findall(sentence))
+                    potential_symptoms.extend(self._vocabulary_ngrams(sentence))
+                else:
+                    # Look for symptom-related phrases
+                    for keyword in self.symptom_keywords:
+                        if keyword in sentence:
+                            # Extract phrases around the keyword
+                            pattern = r'(?:(?:\w+\s+){0,3})' + keyword + r'(?:\s+\w+){0,5}'
+                            matches = re.findall(pattern, sentence)
+                            potential_symptoms.extend(matches)
             
             # Also extract noun phrases as potential symptoms
-            words = word_tokenize(sentence)
-            tagged = nltk.pos_tag(words)
-            
-            # Simple noun phrase extraction
-            i = 0
-            while i < len(tagged):
-                if tagged[i][1].startswith('JJ'):  # Adjective
-                    phrase = [tagged[i][0]]
-                    j = i + 1
-                    while j < len(tagged) and tagged[j][1].startswith('NN'):  # Followed by nouns
-                        phrase.append(tagged[j][0])
-                        j += 1
-                    if j > i + 1:  # If phrase contains at least one noun
-                        potential_symptoms.append(' '.join(phrase))
-                    i = j
-                elif tagged[i][1].startswith('NN'):  # Noun
-                    phrase = [tagged[i][0]]
-                    j = i + 1
-                    while j < len(tagged) and tagged[j][1].startswith('NN'):  # More nouns
-                        phrase.append(tagged[j][0])
-                        j += 1
-                    if phrase:
-                        potential_symptoms.append(' '.join(phrase))
-                    i = j
-                else:
-                    i += 1
+            if pos_tagging:
+                with timer.phase('pos_tag'):
+                    potential_symptoms.extend(self._noun_phrases(sentence))
+        
+        potential_symptoms = list(set(potential_symptoms))
+        timer.count('candidate_phrases', len(potential_symptoms))
+        return potential_symptoms
+    
+    def _noun_phrases(self, sentence):
+        """Adjective/noun chunks of a sentence, from NLTK's POS tagger."""
+        words = word_tokenize(sentence)
+        tagged = nltk.pos_tag(words)
+        phrases = []
+        
+        # Simple noun phrase extraction
+        i = 0
+        while i < len(tagged):
+            if tagged[i][1].startswith('JJ'):  # Adjective
+                phrase = [tagged[i][0]]
+                j = i + 1
+                while j < len(tagged) and tagged[j][1].startswith('NN'):  # Followed by nouns
+                    phrase.append(tagged[j][0])
+                    j += 1
+                if j > i + 1:  # If phrase contains at least one noun
+                    phrases.append(' '.join(phrase))
+                i = j
+            elif tagged[i][1].startswith('NN'):  # Noun
+                phrase = [tagged[i][0]]
+                j = i + 1
+                while j < len(tagged) and tagged[j][1].startswith('NN'):  # More nouns
+                    phrase.append(tagged[j][0])
+                    j += 1
+                if phrase:
+                    phrases.append(' '.join(phrase))
+                i = j
+            else:
+                i += 1
         
-        return list(set(potential_symptoms))
+        return phrases
     
-    def match_symptoms(self, potential_symptoms, threshold=0.3):
-        matched_symptoms = []
+    def _vocabulary_ngrams(self, sentence):
+        """
+        Candidate n-grams whose content words all exist in the TF-IDF vocabulary.
+        
+        An n-gram starts and ends on a known (lemmatized) word, may contain stopwords in
+        between ("loss of appetite") and holds at most max_ngram known words.
+        """
+        tokens = _WORD.findall(sentence)
+        stopwords = self.normalizer.stopwords
+        known = [token not in stopwords and self.normalizer.lemmatize(token) in self._tfidf_terms for token in tokens]
+        usable = [is_known or token in stopwords for token, is_known in zip(tokens, known)]
+        max_span = 2 * self.max_ngram + 1
         
+        ngrams = []
+        for i in range(len(tokens)):
+            if not known[i]:
+                continue
+            content_words = 0
+            for j in range(i, min(len(tokens), i + max_span)):
+                if not usable[j]:
+                    break
+                if known[j]:
+                    content_words += 1
+                    if content_words > self.max_ngram:
+                        break
+                    ngrams.append(' '.join(tokens[i:j + 1]))
+        return ngrams
+    
+    def _usable_phrases(self, potential_symptoms):
+        """Candidate phrases long enough to match, with their preprocessed forms."""
+        phrases = []
+        processed_phrases = []
         for phrase in potential_symptoms:
             processed_phrase = self._preprocess_text(phrase)
             
             # Skip very short phrases
             if len(processed_phrase.split()) < 2 and len(processed_phrase) < 5:
                 continue
+            phrases.append(phrase)
+            processed_phrases.append(processed_phrase)
+        return phrases, processed_phrases
+    
+    def _phrase_vectors(self, processed_phrases):
+        """L2-normalized TF-IDF vectors of preprocessed phrases, in one transform (None if there are none)."""
+        if not processed_phrases:
+            return None
+        return self.embeddings.embed(processed_phrases)
+    
+    def _similarities(self, phrase_vectors):
+        """Dense (phrases x symptoms) cosine similarities, in one sparse product."""
+        if phrase_vectors is None:
+            return np.zeros((0, len(self.symptom_list)))
+        return self.embeddings.similarities(phrase_vectors)
+    
+    def _phrase_similarities(self, potential_symptoms):
+        """
+        Cosine similarity of every usable candidate phrase against every symptom.
+        
+        All phrases are transformed in one call and compared in one sparse product.
+        
+        Returns:
+            Tuple of (phrases, similarities) where similarities is a dense (phrases x symptoms) array
+        """
+        phrases, processed_phrases = self._usable_phrases(potential_symptoms)
+        return phrases, self._similarities(self._phrase_vectors(processed_phrases))
+    
+    def match_phrases(self, potential_symptoms, top_k=3, threshold=0.0):
+        """
+        Best matching symptoms of each candidate phrase.
+        
+        Args:
+            potential_symptoms: candidate phrases
+            top_k: Number of symptoms to return per phrase
+            threshold: Minimum similarity for a symptom to be returned
             
-            phrase_vector = self.vectorizer.transform([processed_phrase])
-            
-            # Calculate similarity with all symptoms
-            similarities = cosine_similarity(phrase_vector, self.symptom_vectors)[0]
-            
-            # Find the most similar symptom
-            max_idx = np.argmax(similarities)
-            max_similarity = similarities[max_idx]
-            
-            if max_similarity >= threshold:
-                matched_symptoms.append((self.symptom_list[max_idx], max_similarity))
+        Returns:
+            List of (phrase, [(symptom, similarity), ...]) with the symptoms best first
+        """
+        phrases, similarities = self._phrase_similarities(potential_symptoms)
+        if not phrases:
+            return []
         
-        # Sort by similarity score and remove duplicates
-        matched_symptoms = sorted(list(set(matched_symptoms)), key=lambda x: x[1], reverse=True)
+        k = min(top_k, similarities.shape[1])
+        top_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top_indices, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top_indices = np.take_along_axis(top_indices, order, axis=1).tolist()
+        top_scores = np.take_along_axis(top_scores, order, axis=1).tolist()
+        
+        return [
+            (phrase, [(self.symptom_list[i], score) for i, score in zip(indices, scores)
+                      if score >= threshold and score > 0])
+            for phrase, indices, scores in zip(phrases, top_indices, top_scores)
+        ]
+    
+    def match_symptoms(self, potential_symptoms, threshold=0.3, timer=NULL_TIMER):
+        with timer.phase('transform'):
+            phrases, processed_phrases = self._usable_phrases(potential_symptoms)
+            phrase_vectors = self._phrase_vectors(processed_phrases)
+        with timer.phase('match'):
+            matched_symptoms = self._best_matches(self._similarities(phrase_vectors), threshold)
+        timer.count('matched_symptoms', len(matched_symptoms))
+        return matched_symptoms
+    
+    def _best_matches(self, similarities, threshold):
+        """Distinct (symptom, score) best matches of the phrase rows above threshold, best first."""
+        if not len(similarities):
+            return []
+        
+        # Find the most similar symptom of every phrase
+        max_indices = similarities.argmax(axis=1)
+        max_similarities = similarities[np.arange(len(similarities)), max_indices]
+        keep = max_similarities >= threshold
+        
+        matched_symptoms = {
+            (self.symptom_list[i], score)
+            for i, score in zip(max_indices[keep].tolist(), max_similarities[keep].tolist())
+        }
+        
+        # Sort by similarity score (duplicates removed by the set)
+        matched_symptoms = sorted(matched_symptoms, key=lambda x: x[1], reverse=True)
         
         return matched_symptoms
     
-    def extract_symptoms(self, text, top_n=5):
+    def extract_symptoms(self, text, top_n=5, mode=None, pos_tagging=None, timer=NULL_TIMER):
         """
         Extract symptoms from user text.
         
         Args:
             text: User input text
             top_n: Maximum number of symptoms to return
+            mode: Candidate extractor, 'full' or 'fast' (defaults to the analyzer's extraction_mode)
+            pos_tagging: Override whether POS-tagged noun phrases are added as candidates
+            timer: PhaseTimer receiving the 'extract', 'pos_tag', 'transform' and 'match' stage durations
             
         Returns:
             List of extracted symptoms with confidence scores
         """
-        potential_symptoms = self._extract_potential_symptoms(text)
-        matched_symptoms = self.match_symptoms(potential_symptoms)
+        potential_symptoms = self._extract_potential_symptoms(text, mode=mode or self.extraction_mode,
+                                                              pos_tagging=pos_tagging, timer=timer)
+        matched_symptoms = self.match_symptoms(potential_symptoms, timer=timer)
         
         # Return top N symptoms
         return matched_symptoms[:top_n]
     
-    def direct_keyword_match(self, text):
+    def extract_symptoms_batch(self, texts, top_n=5, mode=None, pos_tagging=None):
         """
-        Directly check if any symptoms from the list appear in the text.
+        Extract symptoms from many texts at once.
+        
+        The candidate phrases of all texts are vectorized in one transform and compared
+        against the symptoms in one sparse product; each text then takes its own rows.
         
         Args:
-            text: User input text
+            texts: List of user input texts
+            top_n, mode, pos_tagging: See extract_symptoms
             
         Returns:
-            List of directly matched symptoms
+            List with the extract_symptoms result of every text, in input order
         """
-        text = text.lower()
-        direct_matches = []
+        mode = mode or self.extraction_mode
+        offsets = [0]
+        processed_phrases = []
+        for text in texts:
+            potential_symptoms = self._extract_potential_symptoms(text, mode=mode, pos_tagging=pos_tagging)
+            processed_phrases.extend(self._usable_phrases(potential_symptoms)[1])
+            offsets.append(len(processed_phrases))
         
-        for symptom in self.symptom_list:
-            if symptom.lower() in text:
-                direct_matches.append(symptom)
+        similarities = self._similarities(self._phrase_vectors(processed_phrases))
+        return [
+            self._best_matches(similarities[start:end], threshold=0.3)[:top_n]
+            for start, end in zip(offsets, offsets[1:])
+        ]
+    
+    def find_keyword_spans(self, text):
+        """
+        Locate every symptom name or synonym that appears as whole words in the text.
         
-        return direct_matches
\ No newline at end of file
+        Args:
+            text: User input text
+            
+        Returns:
+            List of {'start', 'end', 'text', 'symptom'} dicts (offsets into text), in text order
+        """
+        return [
+            {'start': start, 'end': end, 'text': text[start:end], 'symptom': self.symptom_list[symptom_id]}
+            for start, end, symptom_id in sorted(self.keyword_automaton.find_all(text))
+        ]
+    
+    def direct_keyword_match(self, text):
+        """
+        Directly check if any symptoms from the list (or their synonyms) appear in the text.
+        
+        Args:
+            text: User input text
+            
+        Returns:
+            List of directly matched symptoms, in vocabulary order
+        """
+        symptom_ids = {symptom_id for _, _, symptom_id in self.keyword_automaton.find_all(text)}
+        return [self.symptom_list[i] for i in sorted(symptom_ids)]
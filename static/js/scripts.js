@@ -2,13 +2,7 @@
 document.addEventListener('DOMContentLoaded', async function() {
     try {
         // Fetch all symptoms from your backend using the new endpoint
-        const response = await fetch('/api/all_symptoms', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({}) // Empty body for POST request
-        });
+        const response = await fetch('/api/all_symptoms'); // GET, so the browser can revalidate with its ETag
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -34,13 +28,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     
     // Also fetch diseases data and populate the diseases tab
     try {
-        const diseasesResponse = await fetch('/api/diseases', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({}) // Empty body for POST request
-        });
+        const diseasesResponse = await fetch('/api/diseases'); // GET, so the browser can revalidate with its ETag
         
         if (diseasesResponse.ok) {
             const diseasesData = await diseasesResponse.json();
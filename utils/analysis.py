@@ -0,0 +1,116 @@
+# Text analysis pipeline shared by the single and batch API endpoints
+from utils.response_encoder import AnalysisResponseEncoder
+
+
+class AnalysisPipeline:
+    def __init__(self, data_processor, disease_processor, text_analyzer, max_batch_size=64, response_encoder=None):
+        """
+        Turn free text into extracted symptoms and ranked diseases.
+
+        Args:
+            data_processor: DataProcessor used for disease scoring
+            disease_processor: DiseaseProcessor used for descriptions
+            text_analyzer: TextAnalyzer used for extraction and direct matching
+            max_batch_size: Largest number of texts analyze_batch accepts
+            response_encoder: AnalysisResponseEncoder of these processors (built from them if omitted);
+                              its descriptions are used for the disease details
+        """
+        self.data_processor = data_processor
+        self.disease_processor = disease_processor
+        self.text_analyzer = text_analyzer
+        self.max_batch_size = max_batch_size
+        self.response_encoder = response_encoder or AnalysisResponseEncoder.from_processors(data_processor,
+                                                                                            disease_processor)
+
+    @staticmethod
+    def combine_symptoms(extracted_symptoms, direct_matches):
+        """Merge the similarity matches with the direct keyword matches (direct-only ones at confidence 1.0)."""
+        direct = set(direct_matches)
+        results = [
+            {'symptom': symptom, 'confidence': float(score), 'is_direct_match': symptom in direct}
+            for symptom, score in extracted_symptoms
+        ]
+
+        # If there are direct matches not in extracted symptoms (in order, each once)
+        seen = {symptom for symptom, _ in extracted_symptoms}
+        for symptom in direct_matches:
+            if symptom not in seen:
+                seen.add(symptom)
+                results.append({
+                    'symptom': symptom,
+                    'confidence': 1.0,
+                    'is_direct_match': True
+                })
+        return results
+
+    def disease_details(self, disease_scores):
+        """
+        Format disease scores for the API.
+
+        Args:
+            disease_scores: {disease: score} as returned by get_possible_diseases, best first
+
+        Returns:
+            Tuple of ({disease: score}, [detail dicts with description, sorted by score])
+        """
+        descriptions = self.response_encoder.descriptions
+        possible_diseases = {disease: float(percentage) for disease, percentage in disease_scores.items()}
+        # The scores already come best first (ties in dataset order), the order a stable sort by score keeps
+        disease_details = [
+            {
+                "disease": disease,
+                "score": score,  # Raw score for sorting
+                "score_display": f"{score:.1f}%",  # Formatted for display
+                "description": descriptions[disease] if disease in descriptions
+                else self.disease_processor.get_description(disease)
+            }
+            for disease, score in possible_diseases.items()
+        ]
+        return possible_diseases, disease_details
+
+    def analyze(self, text, mode=None, include_spans=False):
+        """Analyze one text; returns the /api/analyze_text response body."""
+        return self.analyze_batch([text], mode=mode, include_spans=include_spans)[0]
+
+    def analyze_batch(self, texts, mode=None, include_spans=False):
+        """
+        Analyze many texts together.
+
+        Candidate phrases of all texts are vectorized together and the diseases of all
+        texts are scored in one matrix operation.
+
+        Args:
+            texts: List of user texts
+            mode: Candidate extractor, see TextAnalyzer.EXTRACTION_MODES
+            include_spans: Add the character spans of direct matches
+
+        Returns:
+            List of response bodies, in input order
+        """
+        if len(texts) > self.max_batch_size:
+            raise ValueError(f"Batch of {len(texts)} texts exceeds the maximum of {self.max_batch_size}")
+
+        extracted = self.text_analyzer.extract_symptoms_batch(texts, top_n=10, mode=mode)
+        symptom_sets = [
+            self.combine_symptoms(extracted_symptoms, self.text_analyzer.direct_keyword_match(text))
+            for text, extracted_symptoms in zip(texts, extracted)
+        ]
+
+        # Only texts with symptoms are scored
+        scored = [i for i, results in enumerate(symptom_sets) if results]
+        disease_scores = self.data_processor.get_possible_diseases_batch(
+            [[r['symptom'] for r in symptom_sets[i]] for i in scored])
+        scores_by_text = dict(zip(scored, disease_scores))
+
+        responses = []
+        for i, (text, results) in enumerate(zip(texts, symptom_sets)):
+            possible_diseases, disease_details = self.disease_details(scores_by_text.get(i, {}))
+            response = {
+                'extracted_symptoms': results,
+                'possible_diseases': possible_diseases,
+                'disease_details': disease_details
+            }
+            if include_spans:
+                response['direct_match_spans'] = self.text_analyzer.find_keyword_spans(text)
+            responses.append(response)
+        return responses
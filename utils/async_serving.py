@@ -0,0 +1,228 @@
+# ASGI serving of the Flask app: bounded thread pools, timeouts and load shedding
+import asyncio
+import io
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    def __init__(self, name, max_workers, queue_depth):
+        """
+        Thread pool that admits at most max_workers running plus queue_depth waiting calls.
+
+        Args:
+            name: Lane name, used for thread names and metrics labels
+            max_workers: Calls running at once
+            queue_depth: Calls allowed to wait for a free worker; more are rejected
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.capacity = max_workers + queue_depth
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'rem-{name}')
+
+    def try_submit(self, fn, *args):
+        """
+        Submit fn(*args) unless the lane is saturated.
+
+        Returns:
+            concurrent.futures.Future, or None when the call was rejected
+        """
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                return None
+            self.in_flight += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timed_out += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.max_workers),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _error_response(status, message, retry_after=None):
+    """(status, headers, body) of a JSON error in the API's {"error": ...} shape"""
+    headers = [(b'content-type', b'application/json')]
+    if retry_after is not None:
+        headers.append((b'retry-after', str(retry_after).encode('latin-1')))
+    return status, headers, json.dumps({'error': message}).encode('utf-8') + b'\n'
+
+
+class WSGIBridge:
+    def __init__(self, wsgi_app, lanes, route_lane, default_lane, timeouts, max_body_size=1 << 20,
+                 retry_after=1):
+        """
+        ASGI application that serves a WSGI app from bounded thread pools.
+
+        Every request is routed to a lane by path, so slow analyses queue in their own lane
+        and never hold up the cheap catalogue routes. A saturated lane answers 429 at once
+        instead of queueing unboundedly, and a request that does not finish within its lane's
+        timeout gets a 503 (it is dropped if it has not started yet).
+
+        Args:
+            wsgi_app: The Flask (or any WSGI) application
+            lanes: Dict of lane name -> BoundedExecutor
+            route_lane: Dict of request path -> lane name
+            default_lane: Lane of every other path
+            timeouts: Dict of lane name -> seconds a request may take, queueing included
+            max_body_size: Largest request body accepted, in bytes (413 above)
+            retry_after: Retry-After seconds sent with 429 and 503 responses
+        """
+        self.wsgi_app = wsgi_app
+        self.lanes = lanes
+        self.route_lane = route_lane
+        self.default_lane = default_lane
+        self.timeouts = timeouts
+        self.max_body_size = max_body_size
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for lane in self.lanes.values():
+                    lane.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        """Whole request body, or None if it is larger than max_body_size"""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_size:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            response = _error_response(413, 'Request body too large')
+        else:
+            response = await self._dispatch(scope, body)
+
+        status, headers, content = response
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def _dispatch(self, scope, body):
+        lane_name = self.route_lane.get(scope['path'], self.default_lane)
+        lane = self.lanes[lane_name]
+        future = lane.try_submit(self.call_wsgi, self.environ(scope, body))
+        if future is None:
+            logger.warning("Shedding %s %s: %s lane is full", scope['method'], scope['path'], lane_name)
+            return _error_response(429, 'Server busy, retry later', self.retry_after)
+
+        try:
+            # Cancelling a call that is still queued removes it from the pool; a running one
+            # finishes in the background and its response is discarded
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeouts[lane_name])
+        except asyncio.TimeoutError:
+            lane.record_timeout()
+            logger.warning("Timed out %s %s after %.1fs", scope['method'], scope['path'], self.timeouts[lane_name])
+            return _error_response(503, 'Request timed out', self.retry_after)
+
+    @staticmethod
+    def environ(scope, body):
+        """WSGI environ of an ASGI http scope (PEP 3333)"""
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port or ''),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+            environ['REMOTE_PORT'] = str(scope['client'][1])
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def call_wsgi(self, environ):
+        """Run the WSGI app on a worker thread and collect its whole response"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            content = b''.join(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        return response['status'], response['headers'], content
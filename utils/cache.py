@@ -0,0 +1,77 @@
+# Small in-process caches with hit/miss accounting
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        """Size-bounded, thread-safe least-recently-used cache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry; the hit/miss counts stay cumulative (/metrics exports them as counters)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Hits, misses, hit ratio and fill level, for sizing the cache under real traffic."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+class TTLCache(LRUCache):
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        """LRU cache whose entries also expire ttl seconds after they were stored."""
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self._clock = clock
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        super().put(key, (self._clock() + self.ttl, value))
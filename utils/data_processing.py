@@ -1,149 +1,266 @@
 # Data Processing for NLP Models
 
-import pandas as pd
 import numpy as np
 from collections import defaultdict
 import os
-import re
+from scipy.sparse import csr_matrix, diags
+
+from utils.disease_scorer import DiseaseScorer
+from utils.neighbours import top_k_per_row
+from utils.timing import PhaseTimer
+from utils.vocabulary import Vocabulary
 
 class DataProcessor:
-    def __init__(self, data_path):
+    def __init__(self, data_path, knowledge_base=None, cooccurence_dtype=None, related_top_k=20):
+        """
+        Args:
+            data_path: path of dataset.csv
+            knowledge_base: compiled KnowledgeBase to restore from instead of parsing the CSV
+            cooccurence_dtype: optional dtype of the stored co-occurence matrix; a float dtype
+                (e.g. np.float32) stores the default profile co-occurence more compactly, an integer
+                dtype (e.g. np.int32) stores the exact number of dataset rows listing both symptoms
+            related_top_k: number of co-occurence neighbours precomputed per symptom
+        """
         self.data_path = data_path  
-        self.df = None
+        self.cooccurence_dtype = cooccurence_dtype
+        self.related_top_k = related_top_k
         self.symptom_list = []
+        self.disease_list = []
         self.disease_symptom_map = {}
         self.symptom_disease_map = defaultdict(list)
         self.symptom_cooccurence = None
-        self.load_and_process_data()
+        self.related_indices = None
+        self.related_scores = None
+        self.vocabulary = None
+        self.disease_vocabulary = None
+        self.symptom_index = {}
+        self.row_diseases = None
+        self.entry_rows = None
+        self.entry_symptoms = None
+        self.disease_row_counts = None
+        self.profile_counts = None
+        self.profile_weights = None
+        self.scorer = None
+        self.timer = PhaseTimer('DataProcessor')
+        
+        if knowledge_base is not None:
+            self.load_from_knowledge_base(knowledge_base)
+        else:
+            self.load_and_process_data()
         
     def load_and_process_data(self):
-        """Preprocess the dataset"""
+        """Preprocess the dataset (vectorized: no per-row Python loops)"""
+        # Imported here so that restoring from a KnowledgeBase snapshot never imports pandas
+        import pandas as pd
     
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f"Dataset not found at {self.data_path}")
         
-        self.df = pd.read_csv(self.data_path)
-        
-        all_symptom = []
-        cleaned_dataframe = []
+        # The DataFrame is only a parsing step: it is not kept once the integer-coded entries exist
+        with self.timer.phase('read_csv'):
+            df = pd.read_csv(self.data_path)
         
-        symptom_columns = [col for col in self.df.columns if col.startswith('Symptom_')]
+        symptom_columns = [col for col in df.columns if col.startswith('Symptom_')]
 
+        # Cleaning the symptoms from the dreaded '_'. Cells are factorized first so the pandas
+        # string ops only run over the few hundred distinct raw spellings, not every cell
+        with self.timer.phase('normalize'):
+            cells = df[symptom_columns].to_numpy(dtype=object)
+            present = pd.notna(cells).ravel()
+            raw_codes, raw_uniques = pd.factorize(cells.ravel()[present])
+            cleaned_uniques = pd.Index(raw_uniques).str.replace('_', ' ', regex=False).str.lstrip().str.lower()
+            
+            # Long format: one entry per (row, symptom) in row-major order, NaN cells dropped
+            entry_rows = np.flatnonzero(present) // len(symptom_columns)
         
-        # Cleaning the symptoms from the dreaded '_'
-        for _, row in self.df.iterrows():
-            symptoms = [row[col] for col in symptom_columns if pd.notna(row[col])]
-            precleaned_symptoms = [symptom.replace('_', ' ') for symptom in symptoms]
-            cleaned_symptoms = [re.sub(r'^\s+', '', precleaned).lower() for precleaned in precleaned_symptoms]
-            cleaned_dataframe.append(cleaned_symptoms)
+        # Integer symptom ids; factorizing with sort=True makes the ids index symptom_list directly
+        with self.timer.phase('index'):
+            unique_codes, uniques = pd.factorize(cleaned_uniques, sort=True)
+            entry_symptoms = unique_codes[raw_codes]
+            row_diseases, disease_list = pd.factorize(df['Disease'])
         
-        cleaned_df = self.df.copy() # Retain original
-
-        for idx, col in enumerate(symptom_columns):
-            cleaned_df[col] = [cleaned_dataframe[i][idx] if idx < len(cleaned_dataframe[i]) else None for i in range(len(cleaned_dataframe))]
-
-        self.df = cleaned_df
-        print(self.df.head())
-                
-        for col in symptom_columns:
-            symptoms = self.df[col].dropna().unique()
-            all_symptom.extend(symptoms)
-            
-        self.symptom_list = sorted(list(set(all_symptom)))
+        with self.timer.phase('maps'):
+            self._index_entries(list(uniques), list(disease_list), row_diseases, entry_rows, entry_symptoms)
         
-        # Mapping the diseases to symptoms and symptoms to diseases
-        for _, row in self.df.iterrows():
-            disease = row['Disease']
-            symptoms = [row[col] for col in symptom_columns if pd.notna(row[col])]
-            
-            self.disease_symptom_map[disease] = symptoms
-            
-            for symptom in symptoms:
-                if symptom not in self.symptom_disease_map[symptom]:
-                    self.symptom_disease_map[symptom].append(disease)
+        with self.timer.phase('cooccurence'):
+            self._create_cooccurence_matrix()
+    
+    def load_from_knowledge_base(self, knowledge_base):
+        """Restore the processed dataset from a compiled KnowledgeBase snapshot (no CSV parsing)"""
+        
+        with self.timer.phase('maps'):
+            row_indptr = knowledge_base['row_indptr']
+            entry_rows = np.repeat(np.arange(len(row_indptr) - 1), np.diff(row_indptr))
+            self._index_entries(
+                knowledge_base['symptom_list'].tolist(),
+                knowledge_base['disease_list'].tolist(),
+                knowledge_base['row_diseases'],
+                entry_rows,
+                knowledge_base['row_symptoms'],
+            )
+        
+        with self.timer.phase('cooccurence'):
+            # The snapshot holds the default co-occurence; another dtype is computed from the entries
+            if self.cooccurence_dtype is not None:
+                self._create_cooccurence_matrix()
+                return
+            self.symptom_cooccurence = csr_matrix(
+                (knowledge_base['cooccurence_data'],
+                 knowledge_base['cooccurence_indices'],
+                 knowledge_base['cooccurence_indptr']),
+                shape=(len(self.symptom_list), len(self.symptom_list)),
+            )
+            self.related_indices = knowledge_base['related_indices']
+            self.related_scores = knowledge_base['related_scores']
+            self.related_top_k = self.related_indices.shape[1]
+    
+    def _index_entries(self, symptom_list, disease_list, row_diseases, entry_rows, entry_symptoms):
+        """
+        Build the symptom index and the disease/symptom maps from integer-coded entries.
+        
+        Args:
+            symptom_list: sorted symptom names, indexed by symptom id
+            disease_list: disease names in order of first appearance, indexed by disease id
+            row_diseases: disease id of every dataset row
+            entry_rows: dataset row of every (row, symptom) entry, row-major
+            entry_symptoms: symptom id of every entry
+        """
+        self.vocabulary = Vocabulary(symptom_list, sort=False)
+        self.disease_vocabulary = Vocabulary(disease_list, sort=False)
+        self.symptom_list = symptom_list
+        self.disease_list = disease_list
+        self.symptom_index = self.vocabulary.index
+        self.row_diseases = row_diseases
+        self.entry_rows = entry_rows
+        self.entry_symptoms = entry_symptoms
+        
+        disease_names = np.asarray(disease_list, dtype=object)
         
-        # Debug output to verify mappings
-        # print(f"Total unique symptoms: {len(self.symptom_list)}")
-        # print(f"Total diseases mapped: {len(self.disease_symptom_map)}")
-        # print(f"Total symptoms with disease mappings: {len(self.symptom_disease_map)}")
+        # symptom -> disease of every row it appears in (one entry per row)
+        order = np.argsort(entry_symptoms, kind='stable')
+        entry_diseases = disease_names[row_diseases[entry_rows[order]]]
+        bounds = np.searchsorted(entry_symptoms[order], np.arange(len(symptom_list) + 1))
+        self.symptom_disease_map = defaultdict(list, {
+            symptom: entry_diseases[bounds[i]:bounds[i + 1]].tolist()
+            for i, symptom in enumerate(symptom_list) if bounds[i] < bounds[i + 1]
+        })
         
-        self._create_cooccurence_matrix()
+        # Per-disease symptom profile aggregated over all of the disease's rows:
+        # profile_counts[d, s] is the number of rows of d listing s, profile_weights the fraction
+        entry_disease_ids = row_diseases[entry_rows]
+        self.disease_row_counts = np.bincount(row_diseases, minlength=len(disease_list))
+        self.profile_counts = csr_matrix(
+            (np.ones(len(entry_symptoms)), (entry_disease_ids, entry_symptoms)),
+            shape=(len(disease_list), len(symptom_list)),
+        )
+        self.profile_weights = diags(1.0 / np.maximum(self.disease_row_counts, 1)) @ self.profile_counts
+        
+        # disease -> every symptom seen for it, most frequent first
+        self.disease_symptom_map = {}
+        for disease_id, disease in enumerate(disease_list):
+            start, end = self.profile_counts.indptr[disease_id], self.profile_counts.indptr[disease_id + 1]
+            symptom_ids = self.profile_counts.indices[start:end]
+            by_frequency = symptom_ids[np.lexsort((symptom_ids, -self.profile_counts.data[start:end]))]
+            self.disease_symptom_map[disease] = [symptom_list[i] for i in by_frequency]
+        
+        # Symptoms of the last row of each disease; only the compat scoring still measures against it
+        last_rows = np.full(len(disease_list), -1)
+        np.maximum.at(last_rows, row_diseases, np.arange(len(row_diseases)))
+        in_last_row = np.isin(entry_rows, last_rows)
+        last_row_incidence = csr_matrix(
+            (np.ones(int(in_last_row.sum())), (entry_disease_ids[in_last_row], entry_symptoms[in_last_row])),
+            shape=(len(disease_list), len(symptom_list)),
+        )
+        
+        self.scorer = DiseaseScorer(self.disease_vocabulary, self.vocabulary, self.profile_counts,
+                                    self.profile_weights, last_row_incidence)
     
     def _create_cooccurence_matrix(self):
-        """Create a co-occurence matrix of symptoms"""
-        n = len(self.symptom_list)
-        symptom_index = {symptom: i for i, symptom in enumerate(self.symptom_list)}
-        
-        self.symptom_cooccurence = np.zeros((n, n))
-        
-        for disease, symptoms in self.disease_symptom_map.items():
-            for i, symptom1 in enumerate(symptoms):
-                idx1 = symptom_index.get(symptom1)
-                if idx1 is not None: 
-                    for symptom2 in symptoms:
-                        if symptom1 != symptom2:
-                            idx2 = symptom_index.get(symptom2)
-                            if idx2 is not None:
-                                self.symptom_cooccurence[idx1, idx2] += 1
+        """
+        Create a sparse co-occurence matrix of symptoms, kept in CSR form with a zeroed diagonal.
+        
+        By default the matrix is X^T X over the disease x symptom profile matrix (fraction of a
+        disease's rows listing a symptom). With an integer cooccurence_dtype it is X^T X over the
+        row x symptom incidence matrix instead: exact counts of the rows listing both symptoms.
+        """
+        if self.cooccurence_dtype is not None and np.issubdtype(self.cooccurence_dtype, np.integer):
+            incidence = csr_matrix(
+                (np.ones(len(self.entry_symptoms), dtype=np.int64), (self.entry_rows, self.entry_symptoms)),
+                shape=(len(self.row_diseases), len(self.symptom_list)),
+            ).sign()
+            cooccurence = (incidence.T @ incidence).tocsr()
+        else:
+            cooccurence = (self.profile_weights.T @ self.profile_weights).tocsr()
+        cooccurence.setdiag(0)
+        cooccurence.eliminate_zeros()
+        
+        if self.cooccurence_dtype is not None:
+            if np.issubdtype(self.cooccurence_dtype, np.integer) and cooccurence.nnz:
+                if cooccurence.data.max() > np.iinfo(self.cooccurence_dtype).max:
+                    raise ValueError(f"Co-occurence counts overflow {np.dtype(self.cooccurence_dtype).name}")
+            cooccurence = cooccurence.astype(self.cooccurence_dtype)
+        
+        self.symptom_cooccurence = cooccurence
+        self.related_indices, self.related_scores = top_k_per_row(cooccurence, self.related_top_k)
     
     def get_related_symptoms(self, symptom, top_n = 10):
         """
         Get related symptoms for a given symptoms based on its co-occurence.
         
         Args:
-            symptom: the symptom to find related symptoms for
+            symptom: the symptom (name or vocabulary id) to find related symptoms for
             top_n: Number of related symptoms to return
         Returns: 
             List of related symptoms
         """ 
         
-        try:
-            symptom_index = {s: i for i, s, in enumerate(self.symptom_list)}
-            idx = symptom_index[symptom]
-            
-            # Get co-occurence scores
-            scores = self.symptom_cooccurence[idx]
-            
-            # Get top related symptoms
-            top_indices = np.argsort(scores)[::-1][:top_n]
-            related_symptoms = [self.symptom_list[i] for i in top_indices if scores[i] > 0]
-            
-            return related_symptoms
-        except KeyError:
+        idx = self.vocabulary.id_of(symptom)
+        if idx is None:
             return []
+        
+        # Served from the precomputed neighbour table unless more than related_top_k are asked for
+        if top_n <= self.related_top_k:
+            top_indices = self.related_indices[idx, :top_n]
+        else:
+            top_indices, _ = top_k_per_row(self.symptom_cooccurence[idx], top_n)
+            top_indices = top_indices[0]
+        
+        return [self.symptom_list[i] for i in top_indices.tolist() if i >= 0]
     
-    def get_possible_diseases(self, symptoms, limit=8):
+    def get_possible_diseases(self, symptoms, limit=8, compat=False):
         """
         Get possible diseases based on a list of symptoms.
         
         Args:
-            symptoms: list of symptoms
+            symptoms: list of symptom names or vocabulary ids
+            limit: Number of diseases to return
+            compat: Score exactly like the original per-symptom loop (row counts, duplicated
+                symptoms counted twice, match ratio against each disease's last dataset row)
+                instead of against the aggregated disease profiles.
             
         Returns:
-            Dictionary of diseases and their match scores
+            Dictionary of diseases and their match scores, best first
         """
+        return self.scorer.score(symptoms, limit=limit, compat=compat)
+    
+    def get_possible_diseases_batch(self, symptom_sets, limit=8, compat=False):
+        """
+        Score many symptom lists at once (one sparse product for the whole batch).
         
-        disease_scores = defaultdict(int)
-        matched_symptoms_per_disease = defaultdict(list)
-        
-        for symptom in symptoms:
-            # Debug: print symptom and any diseases it maps to
-            diseases_for_symptom = self.symptom_disease_map.get(symptom, [])
-            # print(f"Symptom '{symptom}' maps to {len(diseases_for_symptom)} diseases: {diseases_for_symptom[:3]}...")
+        Args:
+            symptom_sets: list of symptom lists (names or vocabulary ids)
+            limit: Number of diseases to return per list
+            compat: See get_possible_diseases
             
-            for disease in diseases_for_symptom:
-                disease_scores[disease] += 1
-                matched_symptoms_per_disease[disease].append(symptom)
-                
-                # Bonus points if the disease has most of these symptoms
-                disease_symptoms = self.disease_symptom_map.get(disease, [])
-                match_ratio = len(set(symptoms).intersection(disease_symptoms)) / len(disease_symptoms) if disease_symptoms else 0
-                disease_scores[disease] += match_ratio
-        
-        #Sort by scores
-        sorted_diseases = sorted(disease_scores.items(), key=lambda x: x[1], reverse=True)
-        return dict(sorted_diseases[:limit])
+        Returns:
+            List of dictionaries of diseases and their match scores, in input order
+        """
+        return self.scorer.score_batch(symptom_sets, limit=limit, compat=compat)
     
     def get_all_symptoms(self):
         """As the name implies"""
-        return self.symptom_list
\ No newline at end of file
+        return self.symptom_list
+    
+    def get_load_timings(self):
+        """Seconds spent in each phase of load_and_process_data"""
+        return self.timer.report()
\ No newline at end of file
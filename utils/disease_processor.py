@@ -1,30 +1,58 @@
 # Disease Processing for the WebApp
-import pandas as pd
 import numpy as np
 import os
 import re
 
+from utils.vocabulary import Vocabulary
+
 class DiseaseProcessor:
-    def __init__(self, data_path):
+    def __init__(self, data_path, knowledge_base=None):
         self.data_path = data_path
-        self.df = None
         self.disease_dict = {}
-        self.load_and_process_data()
+        self.vocabulary = None
+        self.descriptions = ()
+        
+        if knowledge_base is not None:
+            self.load_from_knowledge_base(knowledge_base)
+        else:
+            self.load_and_process_data()
+        self._index_descriptions()
     
     def load_and_process_data(self):
         """Load the dataset"""
+        import pandas as pd
         
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f'Dataset not Found Lol')
         
-        self.df = pd.read_csv(self.data_path)
+        df = pd.read_csv(self.data_path)
         
-        disease_columns = [col for col in self.df.columns]
+        disease_columns = [col for col in df.columns]
         name, desc = disease_columns
         
-        for _, row in self.df.iterrows():
+        for _, row in df.iterrows():
             self.disease_dict[row[name]] = row[desc]
+    
+    def load_from_knowledge_base(self, knowledge_base):
+        """Restore the descriptions from a compiled KnowledgeBase snapshot"""
+        names = knowledge_base['description_diseases'].tolist()
+        descriptions = knowledge_base['descriptions'].tolist()
+        self.disease_dict = dict(zip(names, descriptions))
+
+    def _index_descriptions(self):
+        """Freeze the disease names into a Vocabulary so lookups tolerate spacing/case variants"""
+        self.vocabulary = Vocabulary(list(self.disease_dict), sort=False)
+        self.descriptions = tuple(self.disease_dict.values())
 
     def get_all_disease(self):
         return self.disease_dict
+
+    def get_description(self, disease, default="No description available"):
+        """Description of a disease by name (e.g. 'Diabetes ' from dataset.csv finds 'Diabetes')"""
+        disease_id = self.vocabulary.id_of(disease)
+        return default if disease_id is None else self.descriptions[disease_id]
+
+    def descriptions_for(self, disease_vocabulary, default="No description available"):
+        """Descriptions aligned with another disease Vocabulary's ids (e.g. DataProcessor's)"""
+        return tuple(self.get_description(disease, default) for disease in disease_vocabulary)
     
\ No newline at end of file
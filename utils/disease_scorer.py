@@ -0,0 +1,97 @@
+# Disease scoring over a sparse disease x symptom incidence matrix
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class DiseaseScorer:
+    def __init__(self, disease_vocabulary, vocabulary, profile_counts, profile_weights, last_row_incidence):
+        """
+        Keep the precomputed disease x symptom matrices used to score diseases.
+
+        Args:
+            disease_vocabulary: Vocabulary of disease names, in disease id order
+            vocabulary: the shared symptom Vocabulary
+            profile_counts: CSR, number of dataset rows of each disease listing each symptom
+            profile_weights: CSR, profile_counts divided by the disease's row count
+            last_row_incidence: CSR, symptoms of the last dataset row of each disease (compat only)
+        """
+        self.disease_list = disease_vocabulary.names
+        self.vocabulary = vocabulary
+        self.profile_counts = csr_matrix(profile_counts)
+        self.profile_weights = csr_matrix(profile_weights)
+        self.profile_mass = np.asarray(self.profile_weights.sum(axis=1)).ravel()
+        self.last_row_incidence = csr_matrix(last_row_incidence)
+        self.last_row_sizes = np.asarray(self.last_row_incidence.sum(axis=1)).ravel()
+
+    def query_matrix(self, symptom_sets):
+        """Encode symptom lists (names or ids) as a (sets x symptoms) count matrix; unknown symptoms are dropped."""
+        rows, cols = [], []
+        for i, symptoms in enumerate(symptom_sets):
+            symptom_ids = self.vocabulary.ids_of(symptoms)
+            rows.extend([i] * len(symptom_ids))
+            cols.extend(symptom_ids)
+        return csr_matrix(
+            (np.ones(len(cols)), (rows, cols)),
+            shape=(len(symptom_sets), len(self.vocabulary)),
+        )
+
+    def score_matrix(self, symptom_sets, compat=False):
+        """
+        Score every disease for every symptom set.
+
+        By default each distinct input symptom contributes its frequency in the disease's rows,
+        and the sum is boosted by the share of the disease's profile it covers:
+        score = match * (1 + match / profile_mass).
+
+        With compat=True the scores are the ones get_possible_diseases originally returned:
+        every input symptom (duplicates included) adds, for each dataset row of a disease that
+        lists it, 1 plus the fraction of the disease's last-row symptoms present in the input.
+
+        Returns:
+            Tuple of (scores, matches), dense (sets x diseases) arrays
+        """
+        queries = self.query_matrix(symptom_sets)
+        present = queries.sign()
+
+        if compat:
+            matches = (queries @ self.profile_counts.T).toarray()
+            overlap = (present @ self.last_row_incidence.T).toarray()
+            sizes = self.last_row_sizes
+        else:
+            matches = (present @ self.profile_weights.T).toarray()
+            overlap = matches
+            sizes = self.profile_mass
+
+        ratio = np.divide(overlap, sizes, out=np.zeros_like(overlap), where=sizes > 0)
+        return matches * (1 + ratio), matches
+
+    def top_diseases(self, scores, matches, limit):
+        """Top `limit` diseases of one score row as a {disease: score} dict, best first."""
+        if limit is not None and limit <= 0:
+            return {}
+        candidates = np.flatnonzero(matches > 0)
+        if limit is not None and len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        # Highest score first; ties keep dataset order
+        order = np.lexsort((candidates, -scores[candidates]))
+        return {self.disease_list[i]: score for i, score in zip(candidates[order].tolist(), scores[candidates[order]].tolist())}
+
+    def score(self, symptoms, limit=8, compat=False):
+        return self.score_batch([symptoms], limit=limit, compat=compat)[0]
+
+    def score_batch(self, symptom_sets, limit=8, compat=False):
+        """
+        Score many symptom sets with one sparse product.
+
+        Args:
+            symptom_sets: list of symptom lists
+            limit: number of diseases to keep per set
+            compat: use the original last-row scoring (see score_matrix)
+
+        Returns:
+            List of {disease: score} dicts in input order
+        """
+        if not symptom_sets:
+            return []
+        scores, matches = self.score_matrix(symptom_sets, compat=compat)
+        return [self.top_diseases(scores[i], matches[i], limit) for i in range(len(symptom_sets))]
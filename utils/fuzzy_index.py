@@ -0,0 +1,131 @@
+# Typo-tolerant name lookup (symmetric delete index, as in SymSpell)
+from itertools import combinations
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions and adjacent
+    transpositions all cost 1), or None when it exceeds max_distance.
+
+    The common prefix and suffix are skipped and only the cells within max_distance of the
+    diagonal are computed, so a typo costs a few cells rather than len(a) x len(b).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+
+    too_far = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        char = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] < value:
+                value = previous[j] + 1
+            if current[j - 1] < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] and previous_previous[j - 2] < value:
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return None
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class FuzzyIndex:
+    def __init__(self, vocabulary, max_distance=2, affix_length=7):
+        """
+        Resolve misspelled names to vocabulary ids.
+
+        Every name is indexed under all strings obtained by deleting up to max_distance characters
+        from its first affix_length characters, and likewise from its last ones (in Vocabulary's
+        canonical form). A query within max_distance of a name is within it on both ends too, so it
+        shares a delete with the name on each end: the candidates are the names found through both,
+        a few dict lookups whatever the vocabulary size, and only they are compared in full.
+
+        Args:
+            vocabulary: the shared Vocabulary
+            max_distance: Largest edit distance resolved
+            affix_length: Characters indexed at each end of a name; longer ends index more deletes
+        """
+        self.vocabulary = vocabulary
+        self.max_distance = max_distance
+        self.affix_length = affix_length
+        self._names = [vocabulary.normalize(name) for name in vocabulary.names]
+        prefixes, suffixes = {}, {}
+        for name_id, name in enumerate(self._names):
+            for variant in self._deletes(name[:affix_length], max_distance):
+                prefixes.setdefault(variant, []).append(name_id)
+            for variant in self._deletes(name[-affix_length:], max_distance):
+                suffixes.setdefault(variant, []).append(name_id)
+        self._prefixes = {variant: frozenset(ids) for variant, ids in prefixes.items()}
+        self._suffixes = {variant: frozenset(ids) for variant, ids in suffixes.items()}
+
+    @staticmethod
+    def _deletes(text, distance):
+        """text and every string made by deleting up to distance of its characters"""
+        variants = {text}
+        for n in range(1, min(distance, len(text)) + 1):
+            variants.update(''.join(kept) for kept in combinations(text, len(text) - n))
+        return variants
+
+    def _candidates(self, query, max_distance):
+        """Ids sharing a delete with the query on both ends"""
+        ends = [
+            [self._prefixes.get(variant, ()) for variant in self._deletes(query[:self.affix_length], max_distance)],
+            [self._suffixes.get(variant, ()) for variant in self._deletes(query[-self.affix_length:], max_distance)],
+        ]
+        # Collect the end with fewer ids, then keep those the other end reaches too
+        ends.sort(key=lambda groups: sum(map(len, groups)))
+        fewer, more = ends
+        candidates = set().union(*fewer)
+        if not candidates:
+            return candidates
+        return set().union(*(candidates.intersection(group) for group in more if group))
+
+    def allowed_distance(self, query):
+        """Edit distance tolerated for a canonical query: at most 1 below 8 characters, so short names stay strict"""
+        return self.max_distance if len(query) >= 8 else min(self.max_distance, 1)
+
+    def lookup(self, name):
+        """
+        Resolve a name, exactly or as the closest indexed name.
+
+        Returns:
+            Tuple of (id, edit distance to the canonical name), or None if nothing is close enough;
+            ties go to the lowest id
+        """
+        name_id = self.vocabulary.id_of(name)
+        if name_id is not None:
+            return name_id, 0
+        if not isinstance(name, str):
+            return None
+
+        query = self.vocabulary.normalize(name)
+        max_distance = self.allowed_distance(query)
+        best = None
+        for candidate in sorted(self._candidates(query, max_distance)):
+            distance = edit_distance(query, self._names[candidate], max_distance)
+            if distance is not None and (best is None or distance < best[1]):
+                best = (candidate, distance)
+                # Distance 0 was an exact canonical match above, so 1 cannot be beaten
+                if distance == 1:
+                    break
+        return best
@@ -1,6 +1,10 @@
-import nltk
+import logging
+import os
+import sys
 
-# try: 
+logger = logging.getLogger(__name__)
+
+# try:
 #     nltk.data.find('corpora/stopwords')
 #     nltk.data.find('corpora/wordnet')
 #     nltk.data.find('taggers/averaged_perceptron_tagger_eng')
@@ -14,20 +18,76 @@ import nltk
 #     nltk.download('punkt_tab')
 
 class NLTKLoader:
-    def setup_nltk_once():
-        resources = {
-            "punkt": "tokenizers/punkt",
-            "wordnet": "corpora/wordnet",
-            "stopwords": "corpora/stopwords",
-            "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
-            "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
-            "punkt_tab" : "tokenizers/punkt_tab"
-        }
-
-        for name, path in resources.items():
+    RESOURCES = {
+        "punkt": "tokenizers/punkt",
+        "wordnet": "corpora/wordnet",
+        "stopwords": "corpora/stopwords",
+        "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+        "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+        "punkt_tab" : "tokenizers/punkt_tab"
+    }
+
+    # Set once the resources were found (or downloaded) in this process
+    _ready = False
+
+    @staticmethod
+    def setup_nltk_once(data_dir=None):
+        """
+        Make sure the NLTK resources are available, at most once per process.
+
+        With a vendored resource directory (data_dir, or the REM_NLTK_DATA environment variable)
+        the resources are only verified on disk: nothing is downloaded and NLTK is not even
+        imported, so air-gapped hosts start without touching the network. Otherwise missing
+        resources are downloaded as before.
+        """
+        if NLTKLoader._ready:
+            return
+        data_dir = data_dir or os.environ.get('REM_NLTK_DATA')
+        if data_dir:
+            NLTKLoader.verify_offline(data_dir)
+        else:
+            NLTKLoader.download_missing()
+        NLTKLoader._ready = True
+
+    @staticmethod
+    def verify_offline(data_dir):
+        """
+        Put a vendored resource directory first on NLTK's search path and check every resource is in it.
+
+        Raises:
+            LookupError: listing the resources missing from data_dir
+        """
+        missing = [name for name, path in NLTKLoader.RESOURCES.items()
+                   if not (os.path.isdir(os.path.join(data_dir, path))
+                           or os.path.isfile(os.path.join(data_dir, path + '.zip')))]
+        if missing:
+            raise LookupError(f"NLTK resources missing from {data_dir}: {', '.join(missing)} "
+                              f"(vendor them with: python -m utils.install {data_dir})")
+
+        # NLTK reads NLTK_DATA when it is first imported; if it already was, update its path directly
+        os.environ['NLTK_DATA'] = os.pathsep.join(filter(None, [data_dir, os.environ.get('NLTK_DATA')]))
+        if 'nltk' in sys.modules:
+            sys.modules['nltk'].data.path.insert(0, data_dir)
+        logger.info("Using vendored NLTK resources from %s", data_dir)
+
+    @staticmethod
+    def download_missing(download_dir=None):
+        import nltk
+
+        for name, path in NLTKLoader.RESOURCES.items():
             try:
-                nltk.data.find(path)
-                print(f"NLTK resource '{name}' is already installed.")
+                nltk.data.find(path, paths=[download_dir] if download_dir else None)
+                logger.debug("NLTK resource '%s' is already installed.", name)
             except LookupError:
-                print(f"Downloading NLTK resource: {name}")
-                nltk.download(name)
\ No newline at end of file
+                logger.info("Downloading NLTK resource: %s", name)
+                nltk.download(name, download_dir=download_dir)
+
+
+if __name__ == '__main__':
+    # Vendor the resources into a directory, for hosts without network access:
+    #   python -m utils.install vendor/nltk_data
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m utils.install <directory>")
+    NLTKLoader.download_missing(sys.argv[1])
+    NLTKLoader.verify_offline(sys.argv[1])
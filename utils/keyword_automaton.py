@@ -0,0 +1,96 @@
+# Aho-Corasick automaton for finding many keywords in a single pass over the text
+import re
+from collections import deque
+
+# Words (letters/digits) and single punctuation marks; whitespace and '_' only separate tokens
+_TOKEN = re.compile(r'[^\W_]+|[^\w\s]')
+
+
+class KeywordAutomaton:
+    def __init__(self, patterns):
+        """
+        Build the automaton.
+
+        The automaton runs over word tokens rather than characters, so every match is
+        word-boundary aligned by construction ("cough" never matches inside "coughing"),
+        matching is case-insensitive and '_' or any run of whitespace between words is
+        equivalent to a single space.
+
+        Args:
+            patterns: iterable of (pattern text, payload) pairs; the payload is returned on a match
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]      # (pattern length in tokens, payload) of patterns ending at the state
+        self._output_link = [0]   # nearest state on the fail chain with outputs (0 = none)
+        self.pattern_count = 0
+
+        for pattern, payload in patterns:
+            tokens = self.tokenize(pattern)
+            if tokens:
+                self._add(tokens, payload)
+        self._link()
+
+    @staticmethod
+    def tokenize(text):
+        return [token.lower() for token in _TOKEN.findall(text)]
+
+    def _add(self, tokens, payload):
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._output_link.append(0)
+                self._goto[state][token] = next_state
+            state = next_state
+        self._outputs[state].append((len(tokens), payload))
+        self.pattern_count += 1
+
+    def _link(self):
+        """Breadth-first pass computing failure and output links."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                self._fail[next_state] = fail
+                self._output_link[next_state] = fail if self._outputs[fail] else self._output_link[fail]
+
+    def find_all(self, text):
+        """
+        Find every pattern occurrence in one pass over the text.
+
+        Args:
+            text: text to scan
+
+        Returns:
+            List of (start, end, payload) with character offsets into the text, in order of end offset
+        """
+        goto, fail, outputs, output_link = self._goto, self._fail, self._outputs, self._output_link
+        matches = []
+        starts = []   # start offset of every token seen so far
+        state = 0
+
+        for match in _TOKEN.finditer(text):
+            token = match.group().lower()
+            starts.append(match.start())
+
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+
+            output_state = state if outputs[state] else output_link[state]
+            while output_state:
+                for length, payload in outputs[output_state]:
+                    matches.append((starts[len(starts) - length], match.end(), payload))
+                output_state = output_link[output_state]
+
+        return matches
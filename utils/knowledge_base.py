@@ -0,0 +1,277 @@
+# Compiled, versioned snapshot of everything the app derives from the CSVs
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the set or meaning of the stored arrays changes
+KB_FORMAT_VERSION = 6
+
+# Arrays derived from the TF-IDF fit of the symptom names
+_EMBEDDING_ARRAYS = (
+    'tfidf_vocabulary', 'tfidf_idf', 'symptom_vectors_data', 'symptom_vectors_indices',
+    'symptom_vectors_indptr', 'symptom_vectors_shape', 'similar_indices', 'similar_scores',
+)
+# Arrays derived from dataset.csv alone
+_DATASET_ARRAYS = (
+    'symptom_list', 'disease_list', 'row_diseases', 'row_indptr', 'row_symptoms', 'cooccurence_data',
+    'cooccurence_indices', 'cooccurence_indptr', 'related_indices', 'related_scores',
+) + _EMBEDDING_ARRAYS
+
+
+class KnowledgeBase:
+    def __init__(self, arrays):
+        """
+        Wrap the arrays of a compiled knowledge base.
+
+        Arrays:
+            symptom_list: sorted symptom vocabulary
+            disease_list: disease names in order of first appearance in dataset.csv
+            row_diseases: disease id of every dataset row
+            row_indptr, row_symptoms: CSR row x symptom incidence of the dataset
+            cooccurence_*: CSR symptom x symptom co-occurence of the disease profiles
+            related_indices, related_scores: precomputed top-k co-occurence neighbours per symptom
+            description_diseases, descriptions: contents of diseases.csv
+            tfidf_vocabulary, tfidf_idf: fitted TF-IDF terms (column order) and idf weights
+            symptom_vectors_*: CSR TF-IDF matrix of the symptom vocabulary
+            similar_indices, similar_scores: top-k most similar symptoms of every symptom
+            dataset_hash, diseases_hash: hashes of each source CSV, for incremental recompiles
+        """
+        self.arrays = arrays
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    @property
+    def source_hash(self):
+        return str(self.arrays['source_hash'])
+
+    @property
+    def dataset_hash(self):
+        return str(self.arrays['dataset_hash'])
+
+    @property
+    def diseases_hash(self):
+        return str(self.arrays['diseases_hash'])
+
+    @property
+    def format_version(self):
+        return int(self.arrays['format_version'])
+
+    @staticmethod
+    def hash_sources(*paths):
+        """Hash the source CSVs (and the snapshot format) into the snapshot key."""
+        digest = hashlib.sha256(f"kb-format-{KB_FORMAT_VERSION}".encode())
+        for path in paths:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def compile(cls, dataset_path, diseases_path, previous=None):
+        """
+        Parse the CSVs, fit the models and collect their state into a KnowledgeBase.
+
+        With the previous KnowledgeBase only what changed is recomputed: when dataset.csv is
+        unchanged (e.g. only descriptions were edited) only diseases.csv is parsed, and when
+        rows changed but the symptom vocabulary did not, the TF-IDF model and the similar-symptom
+        table are kept instead of refitted.
+
+        Args:
+            dataset_path: path of dataset.csv
+            diseases_path: path of diseases.csv
+            previous: optional KnowledgeBase of an earlier version of the same CSVs
+
+        Returns:
+            KnowledgeBase
+        """
+        # Imported here so that loading a snapshot never pays for the fitting code paths
+        from utils.data_processing import DataProcessor
+        from utils.disease_processor import DiseaseProcessor
+
+        dataset_hash = cls.hash_sources(dataset_path)
+        if previous is not None and previous.format_version != KB_FORMAT_VERSION:
+            previous = None
+
+        if previous is not None and previous.dataset_hash == dataset_hash:
+            arrays = {key: value for key, value in previous.arrays.items() if key in _DATASET_ARRAYS}
+            logger.info("dataset.csv is unchanged, only recompiling the descriptions")
+        else:
+            data_processor = DataProcessor(dataset_path)
+            arrays = cls._dataset_arrays(data_processor)
+            if previous is not None and np.array_equal(previous['symptom_list'], arrays['symptom_list']):
+                # The TF-IDF model is fitted on the symptom names only, so it cannot have changed
+                arrays.update((key, previous[key]) for key in _EMBEDDING_ARRAYS)
+                logger.info("Symptom vocabulary is unchanged, keeping the TF-IDF model")
+            else:
+                arrays.update(cls._embedding_arrays(data_processor))
+
+        descriptions = DiseaseProcessor(data_path=diseases_path).get_all_disease()
+        arrays.update({
+            'format_version': np.array(KB_FORMAT_VERSION),
+            'source_hash': np.array(cls.hash_sources(dataset_path, diseases_path)),
+            'dataset_hash': np.array(dataset_hash),
+            'diseases_hash': np.array(cls.hash_sources(diseases_path)),
+            'description_diseases': np.array(list(descriptions.keys()), dtype=str),
+            'descriptions': np.array(list(descriptions.values()), dtype=str),
+        })
+        return cls(arrays)
+
+    @staticmethod
+    def _dataset_arrays(data_processor):
+        row_counts = np.bincount(data_processor.entry_rows, minlength=len(data_processor.row_diseases))
+        row_indptr = np.concatenate([[0], np.cumsum(row_counts)])
+        return {
+            'symptom_list': np.array(data_processor.symptom_list, dtype=str),
+            'disease_list': np.array(data_processor.disease_list, dtype=str),
+            'row_diseases': np.asarray(data_processor.row_diseases, dtype=np.int32),
+            'row_indptr': row_indptr.astype(np.int64),
+            'row_symptoms': np.asarray(data_processor.entry_symptoms, dtype=np.int32),
+            'cooccurence_data': data_processor.symptom_cooccurence.data,
+            'cooccurence_indices': data_processor.symptom_cooccurence.indices,
+            'cooccurence_indptr': data_processor.symptom_cooccurence.indptr,
+            'related_indices': data_processor.related_indices,
+            'related_scores': data_processor.related_scores,
+        }
+
+    @staticmethod
+    def _embedding_arrays(data_processor):
+        from models.symptom_embeddings import SymptomEmbeddingStore
+
+        # SymptomSimilarity and TextAnalyzer share one SymptomEmbeddingStore, whose fitted
+        # TF-IDF model is stored here and restored at startup
+        embeddings = SymptomEmbeddingStore(data_processor.vocabulary)
+        vocabulary = embeddings.vectorizer.vocabulary_
+        terms = sorted(vocabulary, key=vocabulary.get)
+        symptom_vectors = embeddings.vectors
+        return {
+            'tfidf_vocabulary': np.array(terms, dtype=str),
+            'tfidf_idf': np.asarray(embeddings.vectorizer.idf_),
+            'symptom_vectors_data': symptom_vectors.data,
+            'symptom_vectors_indices': symptom_vectors.indices,
+            'symptom_vectors_indptr': symptom_vectors.indptr,
+            'symptom_vectors_shape': np.array(symptom_vectors.shape),
+            'similar_indices': embeddings.neighbour_indices,
+            'similar_scores': embeddings.neighbour_scores,
+        }
+
+    def save(self, path):
+        """Write the snapshot as an uncompressed .npz, atomically replacing any previous one."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **self.arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Load a snapshot written by save().
+
+        With mmap_mode='r' the arrays are read-only views of the file's pages instead of copies:
+        processes loading (or forked after loading) the same snapshot share one copy through the
+        page cache, and no refcount or GC activity ever dirties those pages.
+        """
+        if mmap_mode == 'r':
+            return cls(cls._map_npz(path))
+        if mmap_mode is not None:
+            raise ValueError(f"Unsupported mmap_mode: {mmap_mode}")
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+        return cls(arrays)
+
+    @staticmethod
+    def _map_npz(path):
+        """Read-only arrays backed by one mmap of an uncompressed .npz (np.load cannot mmap archives)."""
+        arrays = {}
+        with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for info in archive.infolist():
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(f"{path} member {info.filename} is compressed and cannot be mapped")
+                # Member data follows its local file header: 30 fixed bytes, then the name and extra field
+                f.seek(info.header_offset)
+                name_length, extra_length = struct.unpack('<26xHH', f.read(30))
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                if dtype.hasobject:
+                    raise ValueError(f"{path} member {info.filename} holds Python objects")
+                arrays[info.filename[:-len('.npy')]] = np.ndarray(
+                    shape, dtype=dtype, buffer=buffer, offset=f.tell(), order='F' if fortran_order else 'C')
+        return arrays
+
+    @classmethod
+    def load_or_build(cls, dataset_path, diseases_path, snapshot_path, mmap_mode=None, previous=None, strict=False):
+        """
+        Load the snapshot if it was compiled from the current CSVs, otherwise rebuild it.
+        mmap_mode is passed to load(); a rebuilt snapshot is then mapped from the file just written.
+        previous is passed to compile() for an incremental rebuild.
+        A rebuilt snapshot that can't be written (e.g. a read-only data directory) is logged and
+        served from memory, unless strict is set.
+
+        Returns:
+            Tuple of (KnowledgeBase, rebuilt) where rebuilt tells whether the CSVs were reparsed
+        """
+        source_hash = cls.hash_sources(dataset_path, diseases_path)
+
+        if os.path.exists(snapshot_path):
+            try:
+                knowledge_base = cls.load(snapshot_path, mmap_mode)
+                if knowledge_base.format_version == KB_FORMAT_VERSION and knowledge_base.source_hash == source_hash:
+                    return knowledge_base, False
+                logger.info("Knowledge base snapshot %s is stale, rebuilding", snapshot_path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logger.warning("Knowledge base snapshot %s is unreadable (%s), rebuilding", snapshot_path, e)
+
+        knowledge_base = cls.compile(dataset_path, diseases_path, previous=previous)
+        try:
+            knowledge_base.save(snapshot_path)
+        except OSError as e:
+            if strict:
+                raise
+            logger.warning("Can't write the knowledge base snapshot %s (%s); serving it from memory", snapshot_path, e)
+            return knowledge_base, True
+        if mmap_mode is not None:
+            knowledge_base = cls.load(snapshot_path, mmap_mode)
+        return knowledge_base, True
+
+    def vectorizer(self):
+        """Rebuild the fitted TfidfVectorizer without refitting it."""
+        # Imported here so that serving the catalogue from a snapshot never imports sklearn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer()
+        vectorizer.vocabulary_ = {term: i for i, term in enumerate(self.arrays['tfidf_vocabulary'].tolist())}
+        vectorizer.idf_ = self.arrays['tfidf_idf']
+        return vectorizer
+
+    def symptom_vectors(self):
+        """The TF-IDF matrix of the symptom vocabulary, one CSR row per symptom."""
+        return csr_matrix(
+            (self.arrays['symptom_vectors_data'],
+             self.arrays['symptom_vectors_indices'],
+             self.arrays['symptom_vectors_indptr']),
+            shape=tuple(self.arrays['symptom_vectors_shape']),
+        )
+
+    def symptom_neighbours(self):
+        """The (indices, scores) top-k similar symptom table of SymptomEmbeddingStore."""
+        return self.arrays['similar_indices'], self.arrays['similar_scores']
@@ -0,0 +1,80 @@
+# Non-blocking, level-gated logging for the app and the CLIs
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Attributes every LogRecord has; anything else was passed through extra= and is a structured field
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """
+    Route all logging through a queue to a background thread that does the actual writing.
+
+    Callers only pay for building the record and a queue put; formatting I/O on a slow
+    stderr pipe never blocks a request. Records below the level are dropped before any
+    message formatting. Safe to call more than once; later calls are ignored.
+
+    Args:
+        level: Level name, default REM_LOG_LEVEL or INFO
+        fmt: 'text' or 'json', default REM_LOG_FORMAT or text
+        stream: Where the listener writes, default stderr
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.environ.get('REM_LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('REM_LOG_FORMAT', 'text')
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    # Flush whatever is still queued on shutdown
+    atexit.register(_listener.stop)
+    # Threads do not survive fork: forked workers (gunicorn, analyze_notes) need their own listener
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    """Start a listener thread in a forked child; records queued before the fork are the parent's to write."""
+    log_queue = _listener.queue
+    while True:
+        try:
+            log_queue.get_nowait()
+        except queue.Empty:
+            break
+    _listener._thread = None
+    _listener.start()
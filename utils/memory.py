@@ -0,0 +1,46 @@
+# Process memory breakdown, for sizing worker counts
+import sys
+
+# Fields of /proc/<pid>/smaps_rollup reported by memory_usage, in kB there
+_SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared_clean',
+    'Shared_Dirty': 'shared_dirty',
+    'Private_Clean': 'private_clean',
+    'Private_Dirty': 'private_dirty',
+}
+
+
+def memory_usage(pid='self'):
+    """
+    Memory of a process in bytes, from /proc/<pid>/smaps_rollup (Linux).
+
+    private_dirty is what every extra forked worker really costs; pss splits shared pages
+    evenly between the processes mapping them, so the pss of all workers sums to their
+    actual total. Elsewhere only the peak RSS of the calling process is available.
+
+    Returns:
+        Dict of rss, pss, shared_clean, shared_dirty, private_clean and private_dirty
+        (just max_rss without smaps_rollup, nothing on Windows)
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        if pid != 'self':
+            raise
+        try:
+            import resource
+        except ImportError:  # Windows
+            return {}
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kB on Linux but in bytes on macOS
+        return {'max_rss': max_rss if sys.platform == 'darwin' else max_rss * 1024}
+
+    usage = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in _SMAPS_FIELDS:
+            usage[_SMAPS_FIELDS[key]] = int(value.split()[0]) * 1024
+    return usage
@@ -0,0 +1,265 @@
+# Everything the app serves from one version of the dataset, and hot reloading of it
+import copy
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.analysis import AnalysisPipeline
+from utils.data_processing import DataProcessor
+from utils.disease_processor import DiseaseProcessor
+from utils.fuzzy_index import FuzzyIndex
+from utils.knowledge_base import KnowledgeBase
+from utils.precomputed_response import PrecomputedResponse
+from utils.response_encoder import AnalysisResponseEncoder
+from utils.timing import NULL_TIMER, PhaseTimer
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBundle:
+    # Source files of a dataset directory; a change to any of them is picked up by a reload
+    SOURCES = ('dataset.csv', 'diseases.csv', 'symptom_synonyms.csv')
+
+    def __init__(self, data_dir, knowledge_base, data_processor, disease_processor, synonyms_hash):
+        """
+        One immutable version of the models: requests take the current bundle once and use it
+        throughout, so a reload swapping in a new bundle never changes a request halfway.
+
+        Build bundles with load() and with_nlp_models() rather than directly.
+        """
+        self.data_dir = data_dir
+        self.knowledge_base = knowledge_base
+        self.data_processor = data_processor
+        self.disease_processor = disease_processor
+        # Results depend on the CSVs (the snapshot hash) and on the synonyms direct matching uses
+        self.version = f"{knowledge_base.source_hash[:16]}-{synonyms_hash[:8]}-v{knowledge_base.format_version}"
+        self.all_symptoms_response = None
+        self.diseases_response = None
+        self.response_encoder = None
+        self.symptom_index = None
+        self.text_normalizer = None
+        self.symptom_embeddings = None
+        self.symptom_similarity_model = None
+        self.text_analyzer = None
+        self.analysis_pipeline = None
+
+    @staticmethod
+    def paths(data_dir):
+        return {name: os.path.join(data_dir, name) for name in ModelBundle.SOURCES}
+
+    @classmethod
+    def load(cls, data_dir, previous=None, timer=NULL_TIMER, snapshot_path=None):
+        """
+        Load (or compile) the knowledge base of data_dir and build the catalogue side of a bundle.
+
+        With the previous bundle, components whose source CSV did not change are reused as they
+        are, and a stale snapshot is recompiled incrementally (see KnowledgeBase.compile).
+        The NLP models are added by with_nlp_models().
+        The snapshot is kept in data_dir unless snapshot_path names another file.
+        """
+        paths = cls.paths(data_dir)
+        snapshot_path = snapshot_path or os.path.join(data_dir, 'knowledge_base.npz')
+        # The arrays are read-only maps of the snapshot file, shared by every process serving it (see gunicorn.conf.py)
+        with timer.phase('knowledge_base'):
+            knowledge_base, _ = KnowledgeBase.load_or_build(
+                paths['dataset.csv'], paths['diseases.csv'], snapshot_path, mmap_mode='r',
+                previous=previous.knowledge_base if previous else None)
+        same_dataset = previous is not None and previous.knowledge_base.dataset_hash == knowledge_base.dataset_hash
+        same_diseases = previous is not None and previous.knowledge_base.diseases_hash == knowledge_base.diseases_hash
+
+        with timer.phase('data_processor'):
+            if same_dataset:
+                data_processor = previous.data_processor
+            else:
+                data_processor = DataProcessor(paths['dataset.csv'], knowledge_base=knowledge_base)
+                logger.info(data_processor.timer.summary())
+
+        with timer.phase('disease_processor'):
+            if same_diseases:
+                disease_processor = previous.disease_processor
+            else:
+                disease_processor = DiseaseProcessor(data_path=paths['diseases.csv'], knowledge_base=knowledge_base)
+
+        bundle = cls(data_dir, knowledge_base, data_processor, disease_processor,
+                     KnowledgeBase.hash_sources(paths['symptom_synonyms.csv']))
+
+        # Resolves misspelled symptom names for /api/related_symptoms
+        with timer.phase('symptom_index'):
+            if previous is not None and previous.data_processor.vocabulary.names == data_processor.vocabulary.names:
+                bundle.symptom_index = previous.symptom_index
+            else:
+                bundle.symptom_index = FuzzyIndex(data_processor.vocabulary)
+
+        # The catalogue endpoints only change with the CSVs: render and compress them once
+        with timer.phase('precomputed_responses'):
+            if same_dataset:
+                bundle.all_symptoms_response = previous.all_symptoms_response
+            else:
+                bundle.all_symptoms_response = PrecomputedResponse({'all_symptoms': data_processor.get_all_symptoms()})
+            if same_diseases:
+                bundle.diseases_response = previous.diseases_response
+            else:
+                bundle.diseases_response = PrecomputedResponse([
+                    {"disease": disease, "description": description}
+                    for disease, description in disease_processor.get_all_disease().items()
+                ])
+            # Analysis responses are encoded from per-symptom and per-disease fragments rendered here
+            if same_dataset and same_diseases:
+                bundle.response_encoder = previous.response_encoder
+            else:
+                bundle.response_encoder = AnalysisResponseEncoder.from_processors(data_processor, disease_processor)
+        return bundle
+
+    def with_nlp_models(self, max_batch_size, previous=None, warm_up=False, timer=NULL_TIMER):
+        """
+        A copy of this bundle with the NLP models (TF-IDF state restored from the snapshot instead of refitted).
+
+        The embedding store (and its normalizer caches) of the previous bundle is reused when the
+        symptom vocabulary is unchanged. warm_up also loads NLTK's tagger, punkt and WordNet now
+        instead of on the first request needing them.
+        """
+        # Imported here so that serving the catalogue never waits for sklearn and NLTK
+        from models.symptom_embeddings import SymptomEmbeddingStore
+        from models.symptom_similarity import SymptomSimilarity
+        from models.text_analyzer import TextAnalyzer
+        from utils.text_normalizer import TextNormalizer
+
+        bundle = copy.copy(self)
+        knowledge_base = self.knowledge_base
+        with timer.phase('nlp_models'):
+            reusable = (previous is not None and previous.symptom_embeddings is not None
+                        and all(np.array_equal(previous.knowledge_base[key], knowledge_base[key])
+                                for key in ('symptom_list', 'tfidf_vocabulary', 'tfidf_idf')))
+            if reusable:
+                bundle.text_normalizer = previous.text_normalizer
+                bundle.symptom_embeddings = previous.symptom_embeddings
+            else:
+                # Every component shares the DataProcessor's symptom vocabulary, so ids mean the same thing everywhere,
+                # and both NLP models share one embedding store (one TF-IDF model, one normalizer and its caches)
+                bundle.text_normalizer = TextNormalizer()
+                bundle.symptom_embeddings = SymptomEmbeddingStore(self.data_processor.vocabulary,
+                                                                  vectorizer=knowledge_base.vectorizer(),
+                                                                  symptom_vectors=knowledge_base.symptom_vectors(),
+                                                                  neighbour_table=knowledge_base.symptom_neighbours(),
+                                                                  normalizer=bundle.text_normalizer)
+            bundle.symptom_similarity_model = SymptomSimilarity(self.data_processor.vocabulary,
+                                                                embeddings=bundle.symptom_embeddings)
+            synonyms_path = self.paths(self.data_dir)['symptom_synonyms.csv']
+            bundle.text_analyzer = TextAnalyzer(self.data_processor.vocabulary,
+                                                synonyms=TextAnalyzer.load_synonyms(synonyms_path),
+                                                embeddings=bundle.symptom_embeddings)
+            bundle.analysis_pipeline = AnalysisPipeline(self.data_processor, self.disease_processor,
+                                                        bundle.text_analyzer, max_batch_size=max_batch_size,
+                                                        response_encoder=self.response_encoder)
+        if warm_up:
+            with timer.phase('nlp_warmup'):
+                bundle.text_analyzer.warm_up()
+        return bundle
+
+
+class ModelReloader:
+    def __init__(self, bundle, build, on_swap=None):
+        """
+        Hold the current ModelBundle and replace it with freshly built ones.
+
+        Args:
+            bundle: The initial bundle
+            build: build(previous bundle, timer) -> new complete bundle
+            on_swap: Optional callback(new bundle) run right after every swap
+        """
+        self.current = bundle
+        self._build = build
+        self._on_swap = on_swap
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.last_reload = None
+
+    def swap(self, bundle):
+        """Make bundle current; requests already holding the old one finish on it."""
+        self.current = bundle
+        if self._on_swap is not None:
+            self._on_swap(bundle)
+
+    def reload(self, wait=False, reason='request'):
+        """
+        Build a new bundle from the files on disk and swap it in.
+
+        Args:
+            wait: Build on the calling thread and return when done; otherwise build on a background thread
+            reason: Recorded in the reload status, e.g. 'request' or 'watcher'
+
+        Returns:
+            False if a reload was already running, else True
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.last_reload = {'state': 'running', 'reason': reason, 'started': time.time()}
+        if wait:
+            self._run(reason)
+        else:
+            threading.Thread(target=self._run, args=(reason,), name='model-reload', daemon=True).start()
+        return True
+
+    def _run(self, reason):
+        timer = PhaseTimer('reload')
+        start = time.perf_counter()
+        previous = self.current
+        try:
+            bundle = self._build(previous, timer)
+        except Exception as e:
+            logger.exception("Model reload failed; still serving %s", previous.version)
+            self.last_reload = {'state': 'failed', 'reason': reason, 'error': str(e),
+                                'seconds': time.perf_counter() - start, 'phases': timer.phases}
+        else:
+            self.swap(bundle)
+            self.reloads += 1
+            self.last_reload = {'state': 'done', 'reason': reason, 'previous_version': previous.version,
+                                'version': bundle.version, 'seconds': time.perf_counter() - start,
+                                'phases': timer.phases}
+            logger.info("Reloaded models %s -> %s in %.2fs (%s)", previous.version, bundle.version,
+                        self.last_reload['seconds'], timer.summary())
+        finally:
+            self._lock.release()
+
+    def status(self):
+        return {'version': self.current.version, 'reloads': self.reloads, 'last_reload': self.last_reload}
+
+    def watch(self, interval=5.0):
+        """
+        Reload whenever a source file of the current bundle's data directory changes (polled by mtime and size).
+
+        The watcher thread is restarted in forked children, so preloaded gunicorn workers watch too.
+        """
+        self._start_watcher(interval)
+        os.register_at_fork(after_in_child=lambda: self._start_watcher(interval))
+
+    def _start_watcher(self, interval):
+        threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True).start()
+
+    def _signature(self):
+        signature = []
+        for path in ModelBundle.paths(self.current.data_dir).values():
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    def _watch(self, interval):
+        seen = self._signature()
+        while True:
+            time.sleep(interval)
+            signature = self._signature()
+            if signature == seen:
+                continue
+            # Wait for a quiet interval so a file still being written is not read half-way
+            time.sleep(interval)
+            if self._signature() != signature:
+                continue
+            # A failed reload is not retried until the files change again
+            if self.reload(wait=True, reason='watcher'):
+                seen = signature
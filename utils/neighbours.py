@@ -0,0 +1,75 @@
+# Top-k neighbour tables over sparse similarity matrices
+import numpy as np
+
+
+def top_k_per_row(matrix, k):
+    """
+    Top k columns of every row of a CSR matrix, best first (ties by column id).
+
+    Returns:
+        Tuple of (indices, scores), both (rows x k); missing neighbours have index -1
+    """
+    n = matrix.shape[0]
+    indices = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=matrix.dtype)
+
+    for row in range(n):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns, values = matrix.indices[start:end], matrix.data[start:end]
+        if len(columns) > k:
+            keep = np.argpartition(-values, k - 1)[:k]
+            columns, values = columns[keep], values[keep]
+        order = np.lexsort((columns, -values))
+        indices[row, :len(order)] = columns[order]
+        scores[row, :len(order)] = values[order]
+
+    return indices, scores
+
+
+def top_k_similar(vectors, k, max_cells=1 << 22):
+    """
+    Top k most similar other rows of every row of an L2-normalized CSR matrix (cosine = dot).
+
+    The similarity matrix is never materialized: it is computed a block of rows at a time,
+    with at most max_cells dense similarities alive at once, so memory stays flat as the
+    vocabulary grows.
+
+    Returns:
+        Tuple of (indices, scores), both (rows x k), best first (ties by descending column id, the
+        order of a reversed stable argsort); rows with fewer than k positive similarities are padded
+        with index -1 and score 0
+    """
+    n = vectors.shape[0]
+    indices = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float64)
+    kk = min(k, n)
+    if kk == 0:
+        return indices, scores
+
+    vectors_t = vectors.T.tocsr()
+    block_rows = max(1, max_cells // max(1, n))
+    for start in range(0, n, block_rows):
+        end = min(n, start + block_rows)
+        block = (vectors[start:end] @ vectors_t).toarray()
+        rows = np.arange(end - start)
+        block[rows, rows + start] = 0  # never your own neighbour
+
+        top = np.argpartition(-block, kk - 1, axis=1)[:, :kk]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.lexsort((-top, -top_scores), axis=-1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        # argpartition splits a tie across the k-th place arbitrarily: redo the rows where it had to
+        kth = top_scores[:, -1]
+        crowded = (kth > 0) & ((block >= kth[:, None]).sum(axis=1) > kk)
+        for row in np.flatnonzero(crowded):
+            columns = np.flatnonzero(block[row] >= kth[row])
+            columns = columns[np.lexsort((-columns, -block[row, columns]))[:kk]]
+            top[row], top_scores[row] = columns, block[row, columns]
+
+        positive = top_scores > 0
+        indices[start:end, :kk] = np.where(positive, top, -1)
+        scores[start:end, :kk] = np.where(positive, top_scores, 0)
+
+    return indices, scores
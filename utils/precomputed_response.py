@@ -0,0 +1,67 @@
+# Pre-rendered, precompressed JSON responses for data that only changes with the CSVs
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+
+class PrecomputedResponse:
+    # Preferred content codings, best compression first
+    ENCODINGS = ('br', 'gzip')
+
+    def __init__(self, payload):
+        """
+        Serialize a JSON payload once and keep its compressed variants.
+
+        The body is byte-for-byte what jsonify produces with compact output (sorted keys,
+        compact separators, trailing newline), so clients can't tell the difference; jsonify
+        pretty-prints in debug mode, where the payload is kept to serve it that way instead.
+
+        Args:
+            payload: JSON-serializable object
+        """
+        self.payload = payload
+        body = (json.dumps(payload, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        # content coding -> (body, strong ETag); each representation gets its own ETag
+        self.variants = {'identity': (body, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self._etags = frozenset(etag.strip('"') for _, etag in self.variants.values())
+
+    def negotiate(self, accept_encodings):
+        """Best available content coding for a Werkzeug Accept-Encoding header ('identity' if none)."""
+        for encoding in self.ENCODINGS:
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+    def to_response(self, request):
+        """
+        Response for the current request: 304 when If-None-Match names any of our ETags,
+        otherwise the negotiated precompressed body.
+        """
+        encoding = self.negotiate(request.accept_encodings)
+        body, etag = self.variants[encoding]
+        headers = {
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': 'public, no-cache',
+        }
+
+        # All variants encode the same data, so any of their ETags validates the cache
+        if_none_match = request.if_none_match
+        if if_none_match.star_tag or any(if_none_match.contains_weak(tag) for tag in self._etags):
+            return Response(status=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype='application/json', headers=headers)
@@ -0,0 +1,75 @@
+# Low-overhead sampling profiler for a single thread
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=0.001, max_depth=64):
+        """
+        Sample the stack of one thread from a background thread.
+
+        Unlike cProfile nothing is hooked into the profiled code, so the overhead is the
+        sampler thread's share of the GIL and the numbers stay close to real latencies.
+
+        Args:
+            thread_id: Thread to sample (default: the calling thread)
+            interval: Seconds between samples
+            max_depth: Deepest stack recorded per sample
+        """
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        """Samples in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def path(self, directory, name):
+        """directory/<name>-<start time>-<pid>-<id>.folded, where save() writes this profile"""
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        return os.path.join(directory, f"{name}-{stamp}-{os.getpid()}-{id(self):x}.folded")
+
+    def save(self, directory, name):
+        """Write the folded stacks to path(directory, name) and return it."""
+        os.makedirs(directory, exist_ok=True)
+        path = self.path(directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+        return path
@@ -0,0 +1,86 @@
+# JSON encoding of analysis responses from fragments rendered once per model version
+import json
+
+from flask import Response
+
+
+def dumps(value):
+    """JSON the way jsonify writes it when compact (sorted keys, compact separators, ASCII only)"""
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+class _Fragments(dict):
+    """Prerendered fragments by name; names without one are rendered on the fly (and not kept)"""
+
+    def __init__(self, render, names):
+        super().__init__((name, render(name)) for name in names)
+        self._render = render
+
+    def __missing__(self, name):
+        return self._render(name)
+
+
+class AnalysisResponseEncoder:
+    def __init__(self, symptom_names, descriptions):
+        """
+        Encode /api/analyze_text and /api/analyze_batch bodies byte-for-byte like jsonify, but from
+        fragments rendered once: only the scores are formatted per response, names and descriptions
+        are never escaped again. That is jsonify's compact output, so debug mode (which pretty-prints)
+        serializes with jsonify itself.
+
+        Args:
+            symptom_names: Every symptom name a response can contain
+            descriptions: {disease: description} of every disease a response can contain
+        """
+        self.descriptions = descriptions
+        # Keys sort as description, disease, score, score_display and confidence, is_direct_match, symptom
+        self._details = {disease: self._detail_head(disease, description) for disease, description in descriptions.items()}
+        self._disease_keys = _Fragments(lambda disease: f'{dumps(disease)}:', descriptions)
+        self._symptoms = _Fragments(lambda symptom: f',"symptom":{dumps(symptom)}}}', symptom_names)
+
+    @staticmethod
+    def _detail_head(disease, description):
+        return f'{{"description":{dumps(description)},"disease":{dumps(disease)},"score":'
+
+    @classmethod
+    def from_processors(cls, data_processor, disease_processor):
+        """Encoder for the symptoms and diseases of a DataProcessor, with DiseaseProcessor's descriptions"""
+        diseases = data_processor.disease_list
+        return cls(data_processor.symptom_list, dict(zip(diseases, disease_processor.descriptions_for(diseases))))
+
+    def encode_body(self, response):
+        """The JSON text of one analysis response dict (see AnalysisPipeline.analyze), without the newline"""
+        details = self._details
+        symptoms = self._symptoms
+        disease_keys = self._disease_keys
+        # Scores are finite floats, whose repr is exactly what json writes; score_display needs no escaping
+        disease_details = ','.join([
+            f'{details.get(d["disease"]) or self._detail_head(d["disease"], d["description"])}'
+            f'{d["score"]!r},"score_display":"{d["score_display"]}"}}'
+            for d in response['disease_details']
+        ])
+        extracted_symptoms = ','.join([
+            f'{{"confidence":{s["confidence"]!r},"is_direct_match":{"true" if s["is_direct_match"] else "false"}'
+            f'{symptoms[s["symptom"]]}'
+            for s in response['extracted_symptoms']
+        ])
+        possible_diseases = response['possible_diseases']
+        scores = ','.join([f'{disease_keys[disease]}{possible_diseases[disease]!r}' for disease in sorted(possible_diseases)])
+
+        # direct_match_spans sorts first
+        spans = response.get('direct_match_spans')
+        head = '{' if spans is None else f'{{"direct_match_spans":{dumps(spans)},'
+        return (f'{head}"disease_details":[{disease_details}],"extracted_symptoms":[{extracted_symptoms}],'
+                f'"possible_diseases":{{{scores}}}}}')
+
+    def encode(self, response):
+        """Bytes of one analysis response, as jsonify(response) would send them"""
+        return f'{self.encode_body(response)}\n'.encode('ascii')
+
+    def encode_batch(self, responses):
+        """Bytes of jsonify({'results': responses})"""
+        return f'{{"results":[{",".join([self.encode_body(response) for response in responses])}]}}\n'.encode('ascii')
+
+    @staticmethod
+    def to_response(body):
+        return Response(body, mimetype='application/json')
@@ -0,0 +1,111 @@
+# Cache of whole API results, keyed on normalized input, parameters and model version
+import hashlib
+import json
+import logging
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCache:
+    def __init__(self, url, ttl=300, prefix='rem:'):
+        """
+        Shared cache backend for multi-worker deployments; values are stored as JSON.
+
+        Redis errors are reported and treated as misses, so an unavailable cache only costs speed.
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("A redis:// cache URL needs the 'redis' package (pip install redis)") from e
+        self._errors = redis.RedisError
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except self._errors as e:
+            logger.warning("Result cache get failed: %s", e)
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(raw)
+
+    def put(self, key, value):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        except self._errors as e:
+            logger.warning("Result cache put failed: %s", e)
+
+    def clear(self):
+        # Keys embed the model version, so stale entries are never read and simply expire;
+        # the hit/miss counts stay cumulative
+        pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ResultCache:
+    def __init__(self, backend, version):
+        """
+        Cache API results per model version.
+
+        Args:
+            backend: TTLCache (in-process) or RedisCache (shared between workers)
+            version: model version, e.g. the knowledge base source hash; part of every key
+        """
+        self.backend = backend
+        self.version = version
+
+    @classmethod
+    def from_url(cls, url, version, maxsize=4096, ttl=300):
+        """In-memory cache for an empty url, Redis for a redis:// url."""
+        if not url:
+            return cls(TTLCache(maxsize, ttl), version)
+        if url.startswith(('redis://', 'rediss://', 'unix://')):
+            return cls(RedisCache(url, ttl), version)
+        raise ValueError(f"Unsupported result cache URL: {url}")
+
+    @staticmethod
+    def normalize_text(text):
+        """Extraction is case-insensitive and ignores surrounding whitespace, so the key is too."""
+        return text.strip().lower()
+
+    def key(self, namespace, text, version=None, **params):
+        """
+        Key of a result: endpoint namespace, model version, normalized text and parameters.
+
+        version is the model version the result is computed with (default: the current one);
+        requests still running on a replaced model pass theirs, so they never fill the new
+        version's entries with old results.
+        """
+        material = json.dumps([self.normalize_text(text), params], sort_keys=True)
+        return f"{namespace}:{version or self.version}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def put(self, key, value):
+        self.backend.put(key, value)
+
+    def set_version(self, version):
+        """Switch to a new model version; results of the old one are dropped, the hit/miss counts kept."""
+        if version != self.version:
+            self.version = version
+            self.backend.clear()
+
+    def stats(self):
+        return {'version': self.version, 'backend': type(self.backend).__name__, **self.backend.stats()}
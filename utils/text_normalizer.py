@@ -0,0 +1,59 @@
+# Shared text normalization for the NLP models
+import string
+
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+from nltk.corpus import stopwords
+
+from utils.cache import LRUCache
+
+# '_' separates words, every other punctuation character is dropped
+_PUNCTUATION_TABLE = str.maketrans({char: (' ' if char == '_' else None) for char in string.punctuation})
+
+
+class TextNormalizer:
+    def __init__(self, phrase_cache_size=4096, lemma_cache_size=16384):
+        """
+        Lowercase, strip punctuation, tokenize, drop stopwords and lemmatize text.
+
+        Whole-phrase results are kept in a bounded LRU cache and single-token lemmas in a
+        second one, since the same short phrases and words recur across requests.
+        """
+        self.stopwords = frozenset(stopwords.words('english'))
+        self.lemmatizer = WordNetLemmatizer()
+        self.phrase_cache = LRUCache(phrase_cache_size)
+        self.lemma_cache = LRUCache(lemma_cache_size)
+
+    def normalize(self, text):
+        """
+        Normalize a phrase into space-separated lemmas.
+
+        Args:
+            text: Raw text
+
+        Returns:
+            The normalized text
+        """
+        normalized = self.phrase_cache.get(text)
+        if normalized is None:
+            normalized = ' '.join(self.lemmatize(token) for token in self.tokens(text))
+            self.phrase_cache.put(text, normalized)
+        return normalized
+
+    def tokens(self, text):
+        """Tokens of the lowercased, punctuation-free text, without stopwords."""
+        tokens = word_tokenize(text.lower().translate(_PUNCTUATION_TABLE))
+        return [token for token in tokens if token not in self.stopwords]
+
+    def lemmatize(self, token):
+        lemma = self.lemma_cache.get(token)
+        if lemma is None:
+            lemma = self.lemmatizer.lemmatize(token)
+            self.lemma_cache.put(token, lemma)
+        return lemma
+
+    def stats(self):
+        return {
+            'phrase_cache': self.phrase_cache.stats(),
+            'lemma_cache': self.lemma_cache.stats(),
+        }
@@ -0,0 +1,78 @@
+# Timing helpers for startup and request phases
+import time
+from contextlib import contextmanager, nullcontext
+from types import MappingProxyType
+
+
+class PhaseTimer:
+    def __init__(self, name):
+        """Record wall-clock durations of named phases, in the order they ran, and event counts."""
+        self.name = name
+        self.phases = {}
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, label):
+        """Time the body of a with-block under the given label."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[label] = self.phases.get(label, 0.0) + (time.perf_counter() - start)
+
+    def count(self, label, amount=1):
+        """Add to a named count (e.g. candidate phrases seen while the phases ran)."""
+        self.counts[label] = self.counts.get(label, 0) + amount
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        """
+        Get the recorded phases.
+
+        Returns:
+            Dictionary of phase label to seconds, plus a 'total' entry
+        """
+        report = dict(self.phases)
+        report['total'] = self.total()
+        return report
+
+    def summary(self):
+        """One-line human readable report, durations in milliseconds."""
+        parts = [f"{label}={seconds * 1000:.1f}ms" for label, seconds in self.phases.items()]
+        parts.append(f"total={self.total() * 1000:.1f}ms")
+        return f"[{self.name}] " + ' '.join(parts)
+
+    def server_timing(self):
+        """Phases as a Server-Timing header value (durations in milliseconds)."""
+        return ', '.join(f"{label};dur={seconds * 1000:.2f}" for label, seconds in self.phases.items())
+
+
+class NullPhaseTimer:
+    """PhaseTimer stand-in for when timing is disabled: phase() is a shared no-op context."""
+    name = None
+    phases = MappingProxyType({})
+    counts = MappingProxyType({})
+    _phase = nullcontext()
+
+    def phase(self, label):
+        return self._phase
+
+    def count(self, label, amount=1):
+        pass
+
+    def total(self):
+        return 0.0
+
+    def report(self):
+        return {}
+
+    def summary(self):
+        return ''
+
+    def server_timing(self):
+        return ''
+
+
+NULL_TIMER = NullPhaseTimer()
@@ -0,0 +1,80 @@
+# Shared, immutable name <-> id vocabulary
+import re
+from types import MappingProxyType
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Vocabulary:
+    __slots__ = ('names', 'index', '_normalized_index')
+
+    def __init__(self, names, sort=True):
+        """
+        Freeze a list of names into id order.
+
+        Args:
+            names: the names; ids are positions in the (optionally sorted) sequence
+            sort: sort the names first (symptoms are kept sorted), otherwise keep the given order
+        """
+        names = tuple(sorted(names) if sort else names)
+        index = {name: i for i, name in enumerate(names)}
+        if len(index) != len(names):
+            raise ValueError("Vocabulary names must be unique")
+
+        normalized_index = {}
+        for i, name in enumerate(names):
+            normalized_index.setdefault(self.normalize(name), i)
+
+        object.__setattr__(self, 'names', names)
+        object.__setattr__(self, 'index', MappingProxyType(index))
+        object.__setattr__(self, '_normalized_index', MappingProxyType(normalized_index))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Vocabulary is immutable")
+
+    def __reduce__(self):
+        return Vocabulary, (self.names, False)
+
+    @staticmethod
+    def normalize(name):
+        """Canonical form used for lookups: lowercase, '_' as space, single spaces, stripped."""
+        return _WHITESPACE.sub(' ', name.replace('_', ' ')).strip().lower()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self, item_id):
+        return self.names[item_id]
+
+    def __contains__(self, name):
+        return self.id_of(name) is not None
+
+    def id_of(self, name, default=None):
+        """
+        Id of a name; exact names hit directly, other spellings through their canonical form.
+
+        Integer ids are passed through unchanged so callers can hand over ids instead of names.
+        """
+        if isinstance(name, (int, np.integer)) and not isinstance(name, bool):
+            return int(name) if 0 <= name < len(self.names) else default
+        item_id = self.index.get(name)
+        if item_id is None and isinstance(name, str):
+            item_id = self._normalized_index.get(self.normalize(name))
+        return default if item_id is None else item_id
+
+    def ids_of(self, names):
+        """Ids of the known names, in input order; unknown names are skipped."""
+        ids = []
+        for name in names:
+            item_id = self.id_of(name)
+            if item_id is not None:
+                ids.append(item_id)
+        return ids
+
+    def name_of(self, item_id):
+        return self.names[item_id]
@@ -0,0 +1,65 @@
+# Load expensive components on a background thread while the app already serves other routes
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoader:
+    def __init__(self, name, load):
+        """
+        Run load() once, either inline (run) or on a daemon thread (start).
+
+        Args:
+            name: Component name, used for logs and the thread name
+            load: Callable doing the work; its exceptions are re-raised by run and
+                  recorded in error by start
+        """
+        self.name = name
+        self._load = load
+        self._done = threading.Event()
+        self._started = False
+        self.error = None
+        self.seconds = None
+
+    def run(self):
+        """Load on the calling thread; errors propagate."""
+        self._started = True
+        start = time.perf_counter()
+        try:
+            self._load()
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    def start(self):
+        """Load on a daemon thread and return immediately."""
+        self._started = True
+        threading.Thread(target=self._run_background, name=f'warmup-{self.name}', daemon=True).start()
+        return self
+
+    def _run_background(self):
+        start = time.perf_counter()
+        try:
+            self._load()
+        except Exception as e:
+            self.error = e
+            logger.exception("Loading %s failed", self.name)
+        else:
+            logger.info("Loaded %s in the background in %.2fs", self.name, time.perf_counter() - start)
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """True once loaded successfully; waits at most timeout seconds."""
+        return self._done.wait(timeout) and self.error is None
+
+    @property
+    def state(self):
+        if not self._started:
+            return 'pending'
+        if not self._done.is_set():
+            return 'loading'
+        return 'failed' if self.error is not None else 'ready'